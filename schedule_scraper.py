@@ -15,9 +15,29 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import requests
+import requests.adapters
 from bs4 import BeautifulSoup as bs
 import re
+import sys
 import datetime
+import array
+import mmap
+import asyncio
+import argparse
+import concurrent.futures
+import json
+import urllib.parse
+import threading
+import time
+import itertools
+import os
+import random
+import tempfile
+import heapq
+import shutil
+import struct
+import signal
+import http.server
 
 
 class SectionMeeting:
@@ -29,11 +49,16 @@ class SectionMeeting:
 
 		if time_match.group(3).lower() == 'p' and start_hour != 12:
 			start_hour += 12
+		elif time_match.group(3).lower() == 'a' and start_hour == 12:
+			# 12 am is midnight
+			start_hour = 0
 		start_minute = int(time_match.group(2))
 
 		end_hour = int(time_match.group(4))
 		if time_match.group(6).lower() == 'p' and end_hour != 12:
 			end_hour += 12
+		elif time_match.group(6).lower() == 'a' and end_hour == 12:
+			end_hour = 0
 		end_minute = int(time_match.group(5))
 
 		self.start_time = datetime.time(hour=start_hour, minute=start_minute)
@@ -71,6 +96,10 @@ class Section:
 
 		self.lock = False
 		self.exclude = False
+
+		# (capacity, actual, remaining) tuples, filled in once a SeatWatcher has looked them up
+		self.seats = None
+		self.waitlist = None
 		
 	def toggle_exclude(self):
 		self.exclude = not self.exclude
@@ -108,232 +137,147 @@ class Section:
 		return True
 
 
+# what each kind of section is called, by the first letter of its section code. courses can have
+# other kinds too (seminars and so on), and those are scheduled just the same
+COMPONENT_NAMES = {"A": "Lecture", "B": "Lab", "T": "Tutorial"}
+
+
+def component_name(component):
+	return COMPONENT_NAMES.get(component, "Other (%s)" % component)
+
+
 class CourseSchedule:
-	def __init__(self, course, lecture, lab, tutorial):
+	def __init__(self, course, sections):
 		self.course = course
-		self.lecture = lecture
-		self.lab = lab
-		self.tutorial = tutorial
-	
+		# one section from each of the course's components, in the same order as course.components
+		self.sections = sections
+
 	def section_and_crn(self):
 		s = "%s" % self.course.code
-		if self.lecture is not None:
-			s += " %s: [%d] " % (self.lecture.section_code, self.lecture.crn)
-		if self.lab is not None:
-			s += " %s: [%d] " % (self.lab.section_code, self.lab.crn)
-		if self.tutorial is not None:
-			s += " %s: [%d] " % (self.tutorial.section_code, self.tutorial.crn)
+		for section in self.sections:
+			s += " %s: [%d] " % (section.section_code, section.crn)
 		return s
-	
+
 	def __str__(self):
 		s = "%s:" % self.course.code
-		if self.lecture is not None:
-			s += " %s" % str(self.lecture)
-		if self.lab is not None:
-			s += " %s" % str(self.lab)
-		if self.tutorial is not None:
-			s += " %s" % str(self.tutorial)
+		for section in self.sections:
+			s += " %s" % str(section)
 		return s
 
 	def __repr__(self):
 		return str(self)
-	
+
 	def compatible_with(self, other_schedule):
-		# combine all the components (lecture, lab, and tutorial) into lists so that
-		# they are flexible (i.e. easy to compare courses w/ lecture and tutorial components
-		# with courses with lecture, lab, tutorial components, etc.
-		this_components = []
-		other_components = []
-
-		if self.lecture is not None:
-			this_components.append(self.lecture)
-		if self.lab is not None:
-			this_components.append(self.lab)
-		if self.tutorial is not None:
-			this_components.append(self.tutorial)
-
-		if other_schedule.lecture is not None:
-			other_components.append(other_schedule.lecture)
-		if other_schedule.lab is not None:
-			other_components.append(other_schedule.lab)
-		if other_schedule.tutorial is not None:
-			other_components.append(other_schedule.tutorial)
-
-		# iterate through both to see if any schedules conflict
-		for ours in this_components:
-			for theirs in other_components:
+		# iterate through both to see if any sections conflict
+		for ours in self.sections:
+			for theirs in other_schedule.sections:
 				if not ours.compatible_with(theirs):
 					# as soon as any two conflict, throw the whole thing out
 					return False
-		
+
 		# none conflict? they're good.
 		return True
 
 
 class CourseOffering:
-	def __init__(self, title, code, lecture_sections, lab_sections, tutorial_sections):
+	def __init__(self, title, code, components):
 		self.title = title
 		self.code = code
-		self.lecture_sections = lecture_sections
-		self.lab_sections = lab_sections
-		self.tutorial_sections = tutorial_sections
-		# self.find_self_consistent_combos()
+		# the sections grouped by component (the first letter of their section codes), e.g.
+		# {"A": [lectures...], "B": [labs...], "T": [tutorials...]}
+		self.components = components
 
 		self.active = True
 
-		self.lecture_locked = False
-		self.lab_locked = False
-		self.tutorial_locked = False
+		# where the listing came from, so that it can be fetched again later
+		self.url = None
 
-	def toggle_lock_lecture(self, index):
-		if self.lecture_sections[index].lock:
-			self.unlock_lecture()
-		else:
-			self.lock_lecture(index)
-
-	def unlock_lecture(self):
-		self.lecture_locked = False
-		for section in self.lecture_sections:
-			section.lock = False
-
-	def lock_lecture(self, index):
-		self.lecture_locked = True
-		for section in self.lecture_sections:
-			section.lock = False
-		self.lecture_sections[index].lock = True
+		self.locked = {component: False for component in components}
 
-	def toggle_lock_lab(self, index):
-		if self.lab_sections[index].lock:
-			self.unlock_lab()
-		else:
-			self.lock_lab(index)
+	def all_sections(self):
+		# sections in the same order the section menu lists them, so a single number picks one out
+		return [section for sections in self.components.values() for section in sections]
 
-	def unlock_lab(self):
-		self.lab_locked = False
-		for section in self.lab_sections:
-			section.lock = False
+	def locate_section(self, number):
+		# turns a number from all_sections into (component, index within that component)
+		for component, sections in self.components.items():
+			if number < len(sections):
+				return component, number
+			number -= len(sections)
+		raise IndexError("no such section")
 
-	def lock_lab(self, index):
-		self.lab_locked = True
-		for section in self.lab_sections:
-			section.lock = False
-		self.lab_sections[index].lock = True
-	
-	def toggle_lock_tutorial(self, index):
-		if self.tutorial_sections[index].lock:
-			self.unlock_tutorial()
+	def toggle_lock(self, component, index):
+		if self.components[component][index].lock:
+			self.unlock(component)
 		else:
-			self.lock_tutorial(index)
+			self.lock(component, index)
 
-	def unlock_tutorial(self):
-		self.tutorial_locked = False
-		for section in self.tutorial_sections:
+	def unlock(self, component):
+		self.locked[component] = False
+		for section in self.components[component]:
 			section.lock = False
 
-	def lock_tutorial(self, index):
-		self.tutorial_locked = True
-		for section in self.tutorial_sections:
+	def lock(self, component, index):
+		self.locked[component] = True
+		for section in self.components[component]:
 			section.lock = False
-		self.tutorial_sections[index].lock = True
-
-	def lock_tutorial(self, index):
-		if self.tutorial_sections[index].lock:
-			self.tutorial_locked = False
-			self.tutorial_sections[index].lock = False
-		else:
-			self.tutorial_locked = True
-			for section in self.tutorial_sections:
-				section.lock = False
-			self.tutorial_sections[index].lock = True
-	
-
-
-	
-	def find_self_consistent_combos(self):
-		lecture_sections = []
-		if self.lecture_locked:
-			for lecture in self.lecture_sections:
-				if lecture.lock:
-					lecture_sections = [lecture]
-					break
-		else:
-			lecture_sections = [section for section in self.lecture_sections if not section.exclude]
-
-		lab_sections = []
-		if self.lab_locked:
-			for lab in self.lab_sections: 
-				if lab.lock:
-					lab_sections = [lab]
-		else:
-			lab_sections = [section for section in self.lab_sections if not section.exclude]
-
-		tutorial_sections = []
-		if self.tutorial_locked:
-			for tutorial in self.tutorial_sections:
-				if tutorial.lock:
-					tutorial_sections = [tutorial]
-		else:
-			tutorial_sections = [section for section in self.tutorial_sections if not section.exclude]
-
-		consistent_combos = []
-		if not lecture_sections:
-			# there are no lecture sections
-			if not lab_sections:
-				# there are only tutorial sections
-				consistent_combos = [CourseSchedule(self, None, None, tut) for tut in tutorial_sections]
-			else:
-				#there are lab sections
-				if not tutorial_sections:
-					# there are only lab sections
-					consistent_combos = [CourseSchedule(self, None, lab, None) for lab in lab_sections]
-				else:
-					# there are only lab and tutorial sections
-					for lab_section in self.lab_sections:
-						for tutorial_section in self.tutorial_sections:
-							if lab_section.compatible_with(tutorial_section):
-								consistent_combos.append(CourseSchedule(self, None, lab_section, tutorial_section))
-		else:
-			# there are lecture sections
-			if not lab_sections:
-				# there are no lab sections
-				if not tutorial_sections:
-					# there are only lecture sections
-					consistent_combos = [CourseSchedule(self, lec, None, None) for lec in lecture_sections]
-				else:
-					# there are only lecture sections and tutorial sections
-					for lecture in lecture_sections:
-						for tutorial in tutorial_sections:
-							if lecture.compatible_with(tutorial):
-								consistent_combos.append(CourseSchedule(self, lecture, None, tutorial))
-			else:
-				# there are lab sections
-				if not tutorial_sections:
-					# there are only lecture and lab sections
-					for lecture in lecture_sections:
-						for lab in lab_sections:
-							if lecture.compatible_with(lab):
-								consistent_combos.append(CourseSchedule(self, lecture, lab, None))
-				else:
-					# there are lecture, lab, and tutorial sections
-					for lecture in lecture_sections:
-						for lab in lab_sections:
-							for tutorial in tutorial_sections:
-								if lecture.compatible_with(lab):
-									if lab.compatible_with(tutorial):
-										consistent_combos.append(CourseSchedule(self, lecture, lab, tutorial))
-		self.consistent_combos = consistent_combos
-				
-
-def earliest_start(schedule):
-	return schedule.find_earliest_start()
-
-
-def latest_end(schedule):
-	return schedule.find_latest_end()
-
-
-def days_off(schedule):
-	return schedule.count_days_off()
+		self.components[component][index].lock = True
+
+	def candidate_sections(self, component):
+		if self.locked[component]:
+			return [section for section in self.components[component] if section.lock][:1]
+		return [section for section in self.components[component] if not section.exclude]
+
+	def find_self_consistent_combos(self, constraint=None):
+		# one candidate list per component. a component with nothing left to choose from (say, every
+		# section is excluded) is left out of the combos, as it always has been
+		candidates = [self.candidate_sections(component) for component in self.components]
+		candidates = [sections for sections in candidates if sections]
+
+		# the same pruning search that finds whole schedules, just over this course's components
+		compat = build_compatibility_index(candidates, constraint)
+		lengths = [len(sections) for sections in candidates]
+		self.consistent_combos = [
+			CourseSchedule(self, tuple(candidates[k][i] for k, i in enumerate(indices)))
+			for indices in iter_schedule_indices(lengths, compat)
+		]
+
+
+def measure_sections(sections):
+	# everything the ranking looks at for a schedule made up of these sections. times are in minutes
+	# after midnight; gaps and compactness are summed over the days with classes
+	minutes = lambda t: t.hour * 60 + t.minute
+	start = 23 * 60 + 59
+	end = 0
+	by_day = {}
+	instructors = []
+	for section in sections:
+		for meeting in section.meetings:
+			start = min(start, minutes(meeting.start_time))
+			end = max(end, minutes(meeting.end_time))
+			for day in meeting.days.lower():
+				by_day.setdefault(day, []).append((minutes(meeting.start_time), minutes(meeting.end_time)))
+			instructors.append(meeting.instructor.lower())
+
+	gaps = 0
+	compactness = 0
+	for intervals in by_day.values():
+		intervals.sort()
+		span_end = intervals[0][1]
+		for interval_start, interval_end in intervals[1:]:
+			if interval_start > span_end:
+				gaps += interval_start - span_end
+			span_end = max(span_end, interval_end)
+		compactness += span_end - intervals[0][0]
+
+	return {
+		"start": start,
+		"end": end,
+		"days_off": len([day for day in "mtwrf" if day not in by_day]),
+		"gaps": gaps,
+		"compactness": compactness,
+		"instructors": tuple(instructors),
+	}
 
 
 class CombinedSchedule:
@@ -353,12 +297,7 @@ class CombinedSchedule:
 	def condense_sections(self):
 		sections = []
 		for course_schedule in self.course_schedules:
-			if course_schedule.lecture is not None:
-				sections.append(course_schedule.lecture)
-			if course_schedule.lab is not None:
-				sections.append(course_schedule.lab)
-			if course_schedule.tutorial is not None:
-				sections.append(course_schedule.tutorial)
+			sections.extend(course_schedule.sections)
 		return sections
 
 	def find_earliest_start(self):
@@ -428,6 +367,327 @@ class CombinedSchedule:
 
 						
 
+# criteria for ScheduleIndex.rank, with a description for the menu
+SCORE_CRITERIA = [
+	("start", "starting the day later"),
+	("end", "finishing the day earlier"),
+	("days_off", "having days off"),
+	("gaps", "fewer gaps between classes"),
+	("compactness", "less time on campus overall"),
+	("instructors", "instructors you like"),
+]
+
+
+# criteria where a smaller number is the better one
+LOWER_IS_BETTER = ("end", "gaps", "compactness")
+
+
+def instructor_score(instructors, instructor_preferences):
+	score = 0
+	for instructor in instructors:
+		for name, preference in instructor_preferences.items():
+			if name.lower() in instructor:
+				score += preference
+	return score
+
+
+class ScheduleIndex:
+	# a compact table of search results: one fixed-width row of unsigned ints per schedule, holding
+	# the combo index chosen for each course followed by the schedule's metrics. sorting only
+	# shuffles an array of row numbers, and CombinedSchedule objects are only built for the rows
+	# somebody actually looks at. given a path, rows are written to that file as they're found and
+	# read back through mmap, so a huge result set lives on disk rather than in memory.
+	#
+	# given a memory budget (in bytes), rows start out in memory and spill to a scratch file once
+	# they outgrow it, and sorts that wouldn't fit are done as an external merge sort: sorted runs
+	# are written to disk and merged into an order file that is read back through mmap too.
+
+	metric_names = ("start", "end", "days_off", "gaps", "compactness")
+	flush_rows = 1 << 16
+	# roughly what one entry of an in-memory sort costs (a key, a row number and a list slot)
+	sort_entry_bytes = 100
+	run_record = struct.Struct("<dI")
+	# the most runs merged at once, which is also the most files an external sort has open
+	merge_fan_in = 64
+
+	def __init__(self, c, path=None, memory_budget=None):
+		self.c = c
+		self.width = len(c) + len(self.metric_names)
+		self.path = path
+		self.memory_budget = memory_budget
+		self.rows = array.array('I')
+		self.buffer_rows = self.flush_rows
+		if memory_budget is not None:
+			self.buffer_rows = max(1, min(self.flush_rows, memory_budget // (self.width * self.rows.itemsize)))
+		self.count = 0
+		self.file = open(path, "w+b") if path is not None else None
+		self.mmap = None
+		self.data = None
+		self.order = None
+		self.order_mmap = None
+		self.order_file = None
+		self.directory = None
+		self.sorts = 0
+
+	def __len__(self):
+		return self.count
+
+	def scratch(self, name):
+		if self.directory is None:
+			self.directory = tempfile.mkdtemp(prefix="schedule_scraper-")
+		return os.path.join(self.directory, name)
+
+	def add(self, indices):
+		sections = []
+		for i in range(len(self.c)):
+			sections += self.c[i].consistent_combos[indices[i]].sections
+		metrics = measure_sections(sections)
+		self.rows.extend(indices)
+		self.rows.extend(metrics[name] for name in self.metric_names)
+		self.count += 1
+		if len(self.rows) >= self.buffer_rows * self.width:
+			if self.file is None and self.memory_budget is not None:
+				# over budget, so from here on the rows live on disk
+				self.file = open(self.scratch("schedules.bin"), "w+b")
+			if self.file is not None:
+				self.rows.tofile(self.file)
+				self.rows = array.array('I')
+
+	def add_rows(self, rows):
+		# rows that were already measured elsewhere (say, in a worker process), as an array laid out
+		# just like this index's own
+		self.rows.extend(rows)
+		self.count += len(rows) // self.width
+
+	def finish(self):
+		if self.file is not None:
+			self.rows.tofile(self.file)
+			self.rows = array.array('I')
+			self.file.flush()
+			if self.count > 0:
+				self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+				self.data = memoryview(self.mmap).cast('I')
+			else:
+				self.data = memoryview(self.rows)
+		else:
+			self.data = memoryview(self.rows)
+		return self
+
+	def release_order(self, order, order_mmap, order_file):
+		if isinstance(order, memoryview):
+			order.release()
+		if order_mmap is not None:
+			order_mmap.close()
+		if order_file is not None:
+			order_file.close()
+			os.remove(order_file.name)
+
+	def close(self):
+		self.release_order(self.order, self.order_mmap, self.order_file)
+		self.order = self.order_mmap = self.order_file = None
+		if self.data is not None:
+			self.data.release()
+			self.data = None
+		if self.mmap is not None:
+			self.mmap.close()
+			self.mmap = None
+		if self.file is not None:
+			self.file.close()
+			self.file = None
+		if self.directory is not None:
+			shutil.rmtree(self.directory, ignore_errors=True)
+			self.directory = None
+
+	def row_number(self, k):
+		return self.order[k] if self.order is not None else k
+
+	def current_order(self):
+		return self.order if self.order is not None else range(self.count)
+
+	def column(self, name):
+		# a strided view of one metric for every row, in the order they were found
+		return self.data[len(self.c) + self.metric_names.index(name)::self.width]
+
+	def combo_indices(self, k):
+		r = self.row_number(k)
+		return tuple(self.data[r * self.width:r * self.width + len(self.c)])
+
+	def schedule(self, k):
+		return schedule_from_indices(self.c, self.combo_indices(k))
+
+	def reorder(self, key):
+		# stable sort of the current order by key(row number), smallest first
+		current = self.current_order()
+		if self.memory_budget is None or self.count * self.sort_entry_bytes <= self.memory_budget:
+			self.replace_order(array.array('I', sorted(current, key=key)), None, None)
+			return
+
+		# external merge sort. each run is a budget-sized slice of the current order, sorted and
+		# written out as (key, row) records; merging the runs keeps equal keys in run order, so
+		# the whole thing is stable just like sorted(). runs are merged merge_fan_in at a time,
+		# in as many passes as it takes, so there's never more than that many files open
+		chunk = max(1, self.memory_budget // self.sort_entry_bytes)
+		runs = []
+		created = []
+		try:
+			for run_start in range(0, self.count, chunk):
+				entries = sorted(((key(r), r) for r in current[run_start:run_start + chunk]), key=lambda entry: entry[0])
+				runs.append(self.scratch("run-%d-0-%d.bin" % (self.sorts, len(runs))))
+				created.append(runs[-1])
+				self.write_run(runs[-1], entries)
+				del entries
+
+			passes = 0
+			while len(runs) > self.merge_fan_in:
+				# merging neighbouring runs together keeps the earlier rows ahead on ties
+				passes += 1
+				merged = []
+				for group_start in range(0, len(runs), self.merge_fan_in):
+					merged.append(self.scratch("run-%d-%d-%d.bin" % (self.sorts, passes, len(merged))))
+					created.append(merged[-1])
+					group = runs[group_start:group_start + self.merge_fan_in]
+					self.write_run(merged[-1], self.merge_runs(group))
+					for path in group:
+						os.remove(path)
+				runs = merged
+
+			order_file = open(self.scratch("order-%d.bin" % self.sorts), "w+b")
+			buffer = array.array('I')
+			for _, r in self.merge_runs(runs):
+				buffer.append(r)
+				if len(buffer) >= self.flush_rows:
+					buffer.tofile(order_file)
+					buffer = array.array('I')
+			buffer.tofile(order_file)
+			order_file.flush()
+		finally:
+			for path in created:
+				if os.path.exists(path):
+					os.remove(path)
+
+		order_mmap = mmap.mmap(order_file.fileno(), 0, access=mmap.ACCESS_READ)
+		self.replace_order(memoryview(order_mmap).cast('I'), order_mmap, order_file)
+
+	def write_run(self, path, entries):
+		with open(path, "wb") as run:
+			block = []
+			for entry in entries:
+				block.append(entry)
+				if len(block) >= self.flush_rows:
+					run.write(b"".join(self.run_record.pack(*entry) for entry in block))
+					block = []
+			run.write(b"".join(self.run_record.pack(*entry) for entry in block))
+
+	def merge_runs(self, paths):
+		# the (key, row) records of several sorted runs, merged into one sorted stream
+		runs = [open(path, "rb") for path in paths]
+		try:
+			yield from heapq.merge(*[self.read_run(run) for run in runs], key=lambda entry: entry[0])
+		finally:
+			for run in runs:
+				run.close()
+
+	def read_run(self, run):
+		while True:
+			block = run.read(self.run_record.size * self.flush_rows)
+			if not block:
+				return
+			yield from self.run_record.iter_unpack(block)
+
+	def replace_order(self, order, order_mmap, order_file):
+		old = (self.order, self.order_mmap, self.order_file)
+		self.order, self.order_mmap, self.order_file = order, order_mmap, order_file
+		self.sorts += 1
+		self.release_order(*old)
+
+	def sort(self, name, reverse=False):
+		column = self.column(name)
+		if reverse:
+			# sorting by the negated value keeps ties in their current order, as sorted(reverse=True) does
+			self.reorder(lambda r: -column[r])
+		else:
+			self.reorder(column.__getitem__)
+
+	def rank(self, weights, instructor_preferences=None):
+		# order the rows by a weighted sum of the criteria in SCORE_CRITERIA, best first. each
+		# criterion is scaled to 0-1 across the rows (1 being the best of them) so that the weights
+		# mean the same thing whatever the units are, and ties keep their current order. it's worked
+		# out row by row so that it can be used with the external sort: one pass to find each
+		# criterion's range, then sort by score
+		if instructor_preferences is None:
+			instructor_preferences = {}
+		current = self.current_order()
+		combo_scores = None
+		criteria = []
+		for criterion, _ in SCORE_CRITERIA:
+			weight = weights.get(criterion, 0)
+			if weight == 0:
+				continue
+			if criterion == "instructors":
+				# instructor scores add up course by course, so score each combo once and sum those
+				combo_scores = [
+					[instructor_score(measure_sections(combo.sections)["instructors"], instructor_preferences) for combo in course.consistent_combos]
+					for course in self.c
+				]
+				value = lambda r: sum(combo_scores[i][self.data[r * self.width + i]] for i in range(len(self.c)))
+			else:
+				value = self.column(criterion).__getitem__
+			low = min((value(r) for r in current), default=0)
+			high = max((value(r) for r in current), default=0)
+			if high == low:
+				continue
+			criteria.append((criterion in LOWER_IS_BETTER, weight / (high - low), low, high, value))
+
+		def key(r):
+			score = 0.0
+			for lower_is_better, scale, low, high, value in criteria:
+				if lower_is_better:
+					score += scale * (high - value(r))
+				else:
+					score += scale * (value(r) - low)
+			return -score
+
+		self.reorder(key)
+
+
+async def ask_weights():
+	# returns (weights, instructor_preferences), or None if the user backed out
+	print("How much do you care about each of these? Give each a weight from 0 (don't care)")
+	print("to 10 (care a lot), or just press enter for 0.")
+	weights = {}
+	for criterion, description in SCORE_CRITERIA:
+		while True:
+			try:
+				answer = (await ask("  %s: " % description)).strip()
+			except EOFError:
+				return None
+			if answer == "":
+				weights[criterion] = 0
+				break
+			try:
+				weights[criterion] = float(answer)
+				break
+			except ValueError:
+				print("  Sorry, that has to be a number.")
+
+	instructor_preferences = {}
+	if weights["instructors"] != 0:
+		print("Which instructors do you like (or not)? Enter part of their name and a score, separated")
+		print("by commas, e.g. \"smith=2, doe=-1\".")
+		try:
+			answer = await ask("  ")
+		except EOFError:
+			return None
+		for item in answer.split(","):
+			name, _, preference = item.partition("=")
+			try:
+				instructor_preferences[name.strip()] = float(preference)
+			except ValueError:
+				if item.strip():
+					print("  I couldn't understand \"%s\", so I'm skipping it." % item.strip())
+	return weights, instructor_preferences
+
+
 def print_schedule_line(day, meeting, current_time, course_code, section_code, lock):
 
 	if day.lower() not in meeting.days.lower():
@@ -467,9 +727,18 @@ def print_schedule_line(day, meeting, current_time, course_code, section_code, l
 	return False
 
 
-def parse_course_from_url(url):
-	r = requests.get(url)
-	soup = bs(r.text, features="html.parser")
+def parse_course_from_url(url, session=None):
+	if session is None:
+		r = requests.get(url, timeout=30)
+	else:
+		r = session.get(url, timeout=30)
+	course = parse_course_from_html(r.text)
+	course.url = url
+	return course
+
+
+def parse_course_from_html(html):
+	soup = bs(html, features="html.parser")
 	sections = []
 	
 	course_title = None
@@ -517,381 +786,2264 @@ def parse_course_from_url(url):
 
 			sections.append(Section(crn, section_code, course_code, meetings))
 
-	lecture_sections = [section for section in sections if section.section_code.startswith('A')]
-	lab_sections = [x for x in sections if x.section_code.startswith('B')]
-	tutorial_sections = [x for x in sections if x.section_code.startswith('T')]
+	components = {}
+	for section in sections:
+		components.setdefault(section.section_code[0], []).append(section)
+
+	# lectures, labs and tutorials first, then any other components in the order they turned up
+	known = list(COMPONENT_NAMES)
+	order = sorted(components, key=lambda component: known.index(component) if component in known else len(known))
 
 	if course_code == None:
 		raise ValueError
-	
-	return CourseOffering(course_title, course_code, lecture_sections, lab_sections, tutorial_sections)
+
+	return CourseOffering(course_title, course_code, {component: components[component] for component in order})
 
 
 def print_sections(course):
-	print("Lecture Sections:")
-	for a in course.lecture_sections:
-		print("  %s" % a)
-	print("Lab Sections:")
-	for b in course.lab_sections:
-		print("  %s" % b)
-	print("Tutorial Sections:")
-	for t in course.tutorial_sections:
-		print("  %s" % t)
-
-
-def find_schedules(courses):
+	for component, sections in course.components.items():
+		print("%s Sections:" % component_name(component))
+		for section in sections:
+			print("  %s" % section)
+
+
+def minutes_after_midnight(t):
+	return t.hour * 60 + t.minute
+
+
+def split_location(location):
+	# "ECS 123" -> ("ECS", "ECS 123"). places like "TBA" don't name a building at all
+	location = location.strip()
+	if not location or location.upper() == "TBA":
+		return None, None
+	parts = location.rsplit(" ", 1)
+	if len(parts) == 2 and re.search(r"\d", parts[1]):
+		return parts[0], location
+	return location, location
+
+
+def split_instructors(text):
+	# "Jane Doe (P), John Smith" -> ["Jane Doe", "John Smith"]
+	names = [re.sub(r"\s*\(P\)", "", name).strip() for name in text.split(",")]
+	return [name for name in names if name and name.upper() != "TBA"]
+
+
+class IntervalTree:
+	# a centered interval tree over closed (start, end, value) intervals, built all at once
+
+	def __init__(self, intervals):
+		self.center = None
+		self.left = None
+		self.right = None
+		if not intervals:
+			return
+		points = sorted(point for start, end, _ in intervals for point in (start, end))
+		self.center = points[len(points) // 2]
+		here = [interval for interval in intervals if interval[0] <= self.center <= interval[1]]
+		self.by_start = sorted(here, key=lambda interval: interval[0])
+		self.by_end = sorted(here, key=lambda interval: interval[1], reverse=True)
+		left = [interval for interval in intervals if interval[1] < self.center]
+		right = [interval for interval in intervals if interval[0] > self.center]
+		if left:
+			self.left = IntervalTree(left)
+		if right:
+			self.right = IntervalTree(right)
+
+	def overlapping(self, start, end):
+		# every interval sharing at least a minute with [start, end]
+		found = []
+		self.collect(start, end, found)
+		return found
+
+	def collect(self, start, end, found):
+		if self.center is None:
+			return
+		if end < self.center:
+			for interval in self.by_start:
+				if interval[0] > end:
+					break
+				found.append(interval)
+		elif start > self.center:
+			for interval in self.by_end:
+				if interval[1] < start:
+					break
+				found.append(interval)
+		else:
+			found.extend(self.by_start)
+		if self.left is not None and start < self.center:
+			self.left.collect(start, end, found)
+		if self.right is not None and end > self.center:
+			self.right.collect(start, end, found)
+
+
+class CatalogIndex:
+	# who teaches what and where, across the loaded courses. instructors, buildings and rooms are
+	# interned to small ids, and each one gets an interval tree per day of when it's in use. the
+	# same ids back TravelConstraint, so the search can check buildings without any string work.
+
+	kinds = ("instructor", "building", "room")
+
+	def __init__(self, courses=()):
+		self.ids = {kind: {} for kind in self.kinds}
+		self.names = {kind: [] for kind in self.kinds}
+		# kind -> id -> [(day, start, end, section, meeting), ...]
+		self.meetings = {kind: {} for kind in self.kinds}
+		self.trees = {}
+		# id(section) -> [(days, start, end, building id), ...]
+		self.places = {}
+		for course in courses:
+			self.add_course(course)
+
+	def intern(self, kind, name):
+		ids = self.ids[kind]
+		if name not in ids:
+			ids[name] = len(self.names[kind])
+			self.names[kind].append(name)
+		return ids[name]
+
+	def add_course(self, course):
+		for section in course.all_sections():
+			self.add_section(section)
+
+	def add_section(self, section):
+		places = []
+		for meeting in section.meetings:
+			start = minutes_after_midnight(meeting.start_time)
+			end = minutes_after_midnight(meeting.end_time)
+			building, room = split_location(meeting.location)
+			names = [("instructor", name) for name in split_instructors(meeting.instructor)]
+			building_id = None
+			if building is not None:
+				building_id = self.intern("building", building)
+				names += [("building", building), ("room", room)]
+			for kind, name in names:
+				ident = self.intern(kind, name)
+				for day in meeting.days.upper():
+					self.meetings[kind].setdefault(ident, []).append((day, start, end, section, meeting))
+					self.trees.pop((kind, ident, day), None)
+			places.append((meeting.days.upper(), start, end, building_id))
+		self.places[id(section)] = places
+
+	def section_places(self, section):
+		if id(section) not in self.places:
+			self.add_section(section)
+		return self.places[id(section)]
+
+	def find(self, kind, part):
+		part = part.lower()
+		return [name for name in self.names[kind] if part in name.lower()]
+
+	def meetings_for(self, kind, name):
+		# every (day, start, end, section, meeting) for this instructor, building or room
+		ident = self.ids[kind].get(name)
+		if ident is None:
+			return []
+		return sorted(self.meetings[kind][ident], key=lambda m: ("MTWRF".find(m[0]), m[1], m[2]))
+
+	def tree(self, kind, ident, day):
+		key = (kind, ident, day)
+		if key not in self.trees:
+			self.trees[key] = IntervalTree([
+				(start, end, (section, meeting))
+				for meeting_day, start, end, section, meeting in self.meetings[kind].get(ident, [])
+				if meeting_day == day
+			])
+		return self.trees[key]
+
+	def busy(self, kind, name, day, start, end):
+		# the (section, meeting) pairs that have this instructor, building or room in use at some
+		# point between start and end (minutes after midnight) on the given day
+		ident = self.ids[kind].get(name)
+		if ident is None:
+			return []
+		return [value for _, _, value in self.tree(kind, ident, day.upper()).overlapping(start, end)]
+
+	def room_conflicts(self):
+		# pairs of different sections booked into the same room at overlapping times
+		conflicts = []
+		for ident, meetings in self.meetings["room"].items():
+			for day in sorted(set(m[0] for m in meetings), key="MTWRF".find):
+				seen = set()
+				for meeting_day, start, end, section, _ in meetings:
+					if meeting_day != day:
+						continue
+					for other, _ in self.busy("room", self.names["room"][ident], day, start, end):
+						pair = tuple(sorted((id(section), id(other))))
+						if other is not section and pair not in seen:
+							seen.add(pair)
+							conflicts.append((self.names["room"][ident], day, section, other))
+		return conflicts
+
+	def back_to_back(self, sections, max_gap=10):
+		# meetings among these sections that follow each other in the same building with at most
+		# max_gap minutes in between. returns (day, building, first section, second section)
+		by_day = {}
+		for section in sections:
+			for days, start, end, building_id in self.section_places(section):
+				for day in days:
+					by_day.setdefault(day, []).append((start, end, building_id, section))
+		found = []
+		for day in sorted(by_day, key="MTWRF".find):
+			meetings = sorted(by_day[day], key=lambda m: (m[0], m[1]))
+			for first, second in zip(meetings, meetings[1:]):
+				if first[2] is not None and first[2] == second[2] and 0 <= second[0] - first[1] <= max_gap:
+					found.append((day, self.names["building"][first[2]], first[3], second[3]))
+		return found
+
+	def travel_constraint(self, minutes):
+		return TravelConstraint(self, minutes)
+
+
+class TravelConstraint:
+	# an extra check for the search: sections are treated as conflicting if one ends and the other
+	# starts (on a shared day) with less than `minutes` to get between two different buildings.
+	# meetings without a known building are never held against anyone
+
+	def __init__(self, catalog, minutes):
+		self.catalog = catalog
+		self.minutes = minutes
+		self.cache = {}
+
+	def sections_ok(self, ours, theirs):
+		key = (id(ours), id(theirs))
+		if key not in self.cache:
+			ok = True
+			for our_days, our_start, our_end, our_building in self.catalog.section_places(ours):
+				for their_days, their_start, their_end, their_building in self.catalog.section_places(theirs):
+					if our_building is None or their_building is None or our_building == their_building:
+						continue
+					if not set(our_days) & set(their_days):
+						continue
+					if max(our_start, their_start) - min(our_end, their_end) < self.minutes:
+						ok = False
+			self.cache[key] = ok
+		return self.cache[key]
+
+	def __call__(self, ours, theirs):
+		# works on sections or whole course schedules
+		our_sections = ours.sections if isinstance(ours, CourseSchedule) else (ours,)
+		their_sections = theirs.sections if isinstance(theirs, CourseSchedule) else (theirs,)
+		for a in our_sections:
+			for b in their_sections:
+				if not self.sections_ok(a, b):
+					return False
+		return True
+
+
+def build_compatibility_index(groups, constraint=None, cancelled=None):
+	# groups is a list of lists of things with a compatible_with method (sections, or a course's
+	# combos). for every pair of groups i < j, store one bitset per item of group i with a bit set for
+	# each item of group j that it doesn't conflict with. the search only has to AND these together
+	# rather than comparing sections over and over again. constraint, if given, is an extra
+	# constraint(ours, theirs) check that also has to pass (like TravelConstraint). if cancelled (a
+	# threading.Event) gets set, this gives up early and what it returns is incomplete.
+	compat = {}
+	for j in range(len(groups)):
+		for i in range(j):
+			compat[(i, j)] = []
+			for ours in groups[i]:
+				if cancelled is not None and cancelled.is_set():
+					return compat
+				mask = 0
+				for b, theirs in enumerate(groups[j]):
+					if ours.compatible_with(theirs) and (constraint is None or constraint(ours, theirs)):
+						mask |= 1 << b
+				compat[(i, j)].append(mask)
+	return compat
+
+
+def iter_schedule_indices(lengths, compat, progress=None, prefix=()):
+	# depth-first search through the courses in order, yielding a tuple of combo indices (one per
+	# course) for each valid schedule. schedules come out in the same order as the old odometer
+	# search (the last course's index changes fastest), but we prune as soon as a course conflicts
+	# with the ones chosen before it. progress, if given, is a SearchProgress that gets told how
+	# far along we are every so often, and can stop the search early. prefix, if given, fixes the
+	# combos of the first few courses (they have to work together), and only schedules starting
+	# with it are searched
+	num = len(lengths)
+	if num == 0:
+		if progress is not None:
+			progress.finish(0)
+		return
+	base = len(prefix)
+	chosen = list(prefix) + [0] * (num - base)
+	masks = [0] * num
+	masks[base] = (1 << lengths[base]) - 1
+	for i in range(base):
+		masks[base] &= compat[(i, base)][chosen[i]]
+	depth = base
+	examined = 0
+	while depth >= base:
+		mask = masks[depth]
+		if not mask:
+			depth -= 1
+			continue
+		# take the lowest remaining candidate for this course
+		low = mask & -mask
+		masks[depth] = mask ^ low
+		chosen[depth] = low.bit_length() - 1
+		if progress is not None:
+			examined += 1
+			if not examined % progress.update_every:
+				progress.update(examined, chosen, depth)
+				if progress.cancelled.is_set():
+					return
+		if depth == num - 1:
+			if progress is not None:
+				progress.examined = examined
+			yield tuple(chosen)
+			continue
+		depth += 1
+		candidates = (1 << lengths[depth]) - 1
+		for i in range(depth):
+			candidates &= compat[(i, depth)][chosen[i]]
+			if not candidates:
+				break
+		masks[depth] = candidates
+	if progress is not None:
+		progress.finish(examined)
+
+
+def search_schedule_indices(lengths, compat, prefixes=None):
+	# run a whole search (or just the part of it starting with each of prefixes, in turn) and return
+	# the index tuples. this is a plain module-level function so that it can be handed off to a
+	# worker process.
+	if prefixes is None:
+		return list(iter_schedule_indices(lengths, compat))
+	return [indices for prefix in prefixes for indices in iter_schedule_indices(lengths, compat, prefix=prefix)]
+
+
+def split_search(lengths, compat, pieces):
+	# splits a search into about `pieces` parts that can be run separately, each a list of prefixes
+	# for search_schedule_indices. running the parts in order finds the schedules in the same order
+	# as the whole search would. the prefixes fix just enough of the first courses to make `pieces`
+	# of them, leaving at least the last course to search
+	depth = 0
+	size = 1
+	while depth < len(lengths) - 1 and size < pieces:
+		size *= lengths[depth]
+		depth += 1
+	if depth == 0:
+		return [[()]]
+	prefixes = list(iter_schedule_indices(lengths[:depth], compat))
+	step = max(1, -(-len(prefixes) // pieces))
+	return [prefixes[k:k + step] for k in range(0, len(prefixes), step)]
+
+
+def prepare_search(courses, constraint=None, cancelled=None):
+	# returns the active courses along with their combo counts and compatibility index, or None if
+	# some course has no workable combos at all (or cancelled, a threading.Event, gets set)
 	c = [course for course in courses if course.active == True]
 	for course in c:
-		course.find_self_consistent_combos()
-		if len(course.consistent_combos) < 1:
-			return []
-	possible_schedules = []
-	# number of courses under consideration
-	num = len(c)
-	# number of possible (consistent) schedules for each course under consideration
+		course.find_self_consistent_combos(constraint)
+		if len(course.consistent_combos) < 1 or (cancelled is not None and cancelled.is_set()):
+			return None
 	lengths = [len(course.consistent_combos) for course in c]
-	# which combo of course schedules we are currently considering
-	current_indices = [0 for _ in range(num)]
-	# which course's schedule index we are incrementing
-	index_index = len(current_indices) - 1
-
-	# we start at the end of c (the courses) and increment that course's index (in current_indices)
-	# until it reaches its max (as read from lengths) and then we increment the next one to the left
-	# and zero it out as well as the ones to the right proceeding through all possible permutations
-	# of all the course schedules, accumulating valid ones in possible_schedules
-
-	while True: 
-		# compare each of the current schedules to each other discarding the permutation if it has
-		# a conflict
-		for i in range(num):
-			for j in range(num):
-				if i <= j:
-					continue
-				if not c[i].consistent_combos[current_indices[i]].compatible_with(c[j].consistent_combos[current_indices[j]]):
-					# print("disqualified conflicting schedule: " + str([c[x].consistent_combos[current_indices[x]] for x in range(num)]))
-					break
-			# python trick to break out of the inner loop; this else statement is only executed
-			# if the for loop completed without a break statement
-			else:
+	compat = build_compatibility_index([course.consistent_combos for course in c], constraint, cancelled)
+	if cancelled is not None and cancelled.is_set():
+		return None
+	return c, lengths, compat
+
+
+def schedule_from_indices(c, indices):
+	return CombinedSchedule([c[i].consistent_combos[indices[i]] for i in range(len(c))])
+
+
+def print_schedule_summary(index):
+	as_time = lambda m: datetime.time(hour=m // 60, minute=m % 60)
+	latest_start_time = as_time(max(index.column("start"), default=0))
+	earliest_finish_time = as_time(min(index.column("end"), default=23 * 60 + 59))
+	num_with_dayoff = len([days for days in index.column("days_off") if days > 0])
+	print("Latest possible start time: %s" % latest_start_time.strftime(r"%I:%M %p"))
+	print("Earliest possible finish time: %s" % earliest_finish_time.strftime(r"%I:%M %p"))
+	print("Number of schedules with at least one day off: %d" % num_with_dayoff)
+
+
+def search_in_background(courses, constraint, path, memory_budget, progress):
+	# prepare_search and build_schedule_index together, for the menu's background searches, so that
+	# the whole thing (building the compatibility index can take a while too) can be watched and
+	# cancelled through progress. returns None if it was cancelled
+	prepared = prepare_search(courses, constraint, progress.cancelled)
+	if progress.cancelled.is_set():
+		return None
+	if prepared is None:
+		# some course can't be scheduled at all, so there's nothing to search
+		prepared = ([], [], {})
+	c, lengths, compat = prepared
+	progress.prepared(c, lengths)
+	return build_schedule_index(c, lengths, compat, path, memory_budget, progress)
+
+
+def build_schedule_index(c, lengths, compat, path=None, memory_budget=None, progress=None):
+	# the search itself, once prepare_search has been done. returns None (and throws away what it
+	# found) if the search was cancelled through progress
+	index = ScheduleIndex(c, path, memory_budget)
+	for indices in iter_schedule_indices(lengths, compat, progress):
+		index.add(indices)
+		if progress is not None:
+			progress.result(indices)
+	if progress is not None and progress.cancelled.is_set():
+		index.close()
+		return None
+	return index.finish()
+
+
+def find_schedule_index(courses, path=None, memory_budget=None, constraint=None):
+	prepared = prepare_search(courses, constraint)
+	if prepared is None:
+		return ScheduleIndex([], path, memory_budget).finish()
+	c, lengths, compat = prepared
+	return build_schedule_index(c, lengths, compat, path, memory_budget)
+
+
+def find_schedules(courses, constraint=None):
+	prepared = prepare_search(courses, constraint)
+	if prepared is None:
+		return []
+	c, lengths, compat = prepared
+	return [schedule_from_indices(c, indices) for indices in iter_schedule_indices(lengths, compat)]
+
+
+class SearchProgress:
+	# shared between a search running in a worker thread and the menu keeping an eye on it. the
+	# search only writes to it and the menu only reads, apart from the cancelled flag. it also
+	# holds on to the first few schedules found, so they can be looked at before the search is done
+
+	preview_limit = 1000
+	# how many search steps go by between updates (and checks for cancelling)
+	update_every = 4096
+
+	def __init__(self, c=None, lengths=None):
+		# c and lengths can be left out while the search is still being prepared
+		self.c = c
+		self.lengths = lengths
+		self.examined = 0
+		self.found = 0
+		# how much of the whole search space is behind us, from 0 to 1
+		self.fraction = 0.0
+		self.preview = []
+		self.started = time.monotonic()
+		self.cancelled = threading.Event()
+
+	def prepared(self, c, lengths):
+		self.c = c
+		self.lengths = lengths
+		self.started = time.monotonic()
+
+	def update(self, examined, chosen, depth):
+		# the search goes through each course's combos in order, so the combos it's on right now
+		# say how much of the space has been covered, like the digits of a number
+		fraction = 0.0
+		scale = 1.0
+		for k in range(depth + 1):
+			scale /= self.lengths[k]
+			fraction += chosen[k] * scale
+		self.examined = examined
+		self.fraction = fraction
+
+	def finish(self, examined):
+		self.examined = examined
+		self.fraction = 1.0
+
+	def result(self, indices):
+		if len(self.preview) < self.preview_limit:
+			self.preview.append(indices)
+		self.found += 1
+
+	def eta(self):
+		# seconds left, going by how fast it's been so far
+		if self.fraction <= 0:
+			return None
+		elapsed = time.monotonic() - self.started
+		return elapsed * (1 - self.fraction) / self.fraction
+
+	def describe(self):
+		if self.lengths is None:
+			return "getting ready (working out which sections go together)"
+		eta = self.eta()
+		if eta is None:
+			left = "not sure how long it'll take yet"
+		elif eta < 90:
+			left = "about %d seconds left" % round(eta)
+		elif eta < 90 * 60:
+			left = "about %d minutes left" % round(eta / 60)
+		elif eta < 48 * 3600:
+			left = "about %d hours left" % round(eta / 3600)
+		else:
+			left = "about %d days left" % round(eta / 86400)
+		return "examined %d candidates, found %d schedules so far, %.1f%% done, %s" % (self.examined, self.found, self.fraction * 100, left)
+
+	# the preview works like a (short) ScheduleIndex, so the schedule viewer can show it
+	def __len__(self):
+		return len(self.preview)
+
+	def schedule(self, k):
+		return schedule_from_indices(self.c, self.preview[k])
+
+
+class BackgroundJob:
+	# something slow, like fetching a course or searching for schedules, running in a worker thread
+	# while the menu stays usable. future is the asyncio future for it, and progress is the job's
+	# SearchProgress, if it has one. stop, if given, is a threading.Event that ends the job when set
+
+	def __init__(self, description, future, progress=None, stop=None):
+		self.description = description
+		self.future = future
+		self.progress = progress
+		self.stop = stop
+
+	def running(self):
+		return not self.future.done()
+
+	def cancel(self):
+		# a fetch can't be interrupted, so its result is just ignored. a search stops for real
+		if self.progress is not None:
+			self.progress.cancelled.set()
+		if self.stop is not None:
+			self.stop.set()
+		self.future.cancel()
+
+	def status(self):
+		if self.future.cancelled():
+			state = "cancelled"
+		elif self.future.done():
+			state = "failed" if self.future.exception() is not None else "done"
+		elif self.progress is not None:
+			state = self.progress.describe()
+		else:
+			state = "working on it"
+		return "%s: %s" % (self.description, state)
+
+
+# times that tend to trip up time handling: midnight, noon, the very end of the day, and pairs
+# of meetings that touch end-to-start
+EDGE_TIME_RANGES = [
+	"12:00 am - 12:50 am",
+	"12:50 am - 1:30 am",
+	"11:30 am - 12:00 pm",
+	"12:00 pm - 12:50 pm",
+	"12:50 pm - 1:50 pm",
+	"11:00 pm - 11:59 pm",
+	"8:30 am - 9:20 am",
+	"9:20 am - 10:20 am",
+]
+
+
+def random_time_range(rng):
+	if rng.random() < 0.3:
+		return rng.choice(EDGE_TIME_RANGES)
+	start = rng.randrange(0, 23 * 60, 10)
+	end = min(start + rng.choice([20, 50, 80, 110, 170]), 23 * 60 + 59)
+	as_text = lambda m: datetime.time(hour=m // 60, minute=m % 60).strftime(r"%I:%M %p")
+	return "%s - %s" % (as_text(start), as_text(end))
+
+
+def random_course_offering(rng, number):
+	# a made-up course with a random set of components, sections, locks and excludes. some
+	# components end up empty, or with every section excluded, and some sections never meet
+	code = "FUZ %d" % (100 + number)
+	components = {}
+	crn = 10000 + number * 100
+	for component in rng.sample("ABTS", rng.randint(1, 4)):
+		components[component] = []
+		for i in range(rng.choice([0, 1, 1, 2, 2, 3, 4])):
+			crn += 1
+			meetings = []
+			for _ in range(rng.choice([0, 1, 1, 1, 2])):
+				days = "".join(day for day in "MTWRF" if rng.random() < 0.4)
+				location = rng.choice(["ECS %d" % rng.randint(100, 130), "ELL %d" % rng.randint(100, 130), "CLE A%d" % rng.randint(100, 130), "TBA"])
+				meetings.append(SectionMeeting(random_time_range(rng), days, location, "Instructor %d" % rng.randint(1, 3)))
+			components[component].append(Section(crn, "%s%02d" % (component, i + 1), code, meetings))
+
+	course = CourseOffering("Fuzz course %d" % number, code, components)
+	for component, sections in components.items():
+		for section in sections:
+			if rng.random() < 0.15:
+				section.toggle_exclude()
+		if sections and rng.random() < 0.15:
+			course.lock(component, rng.randrange(len(sections)))
+	course.active = rng.random() < 0.9
+	return course
+
+
+def reference_compatible(ours, theirs):
+	# the plain definition of two sections getting along: no day they share has meetings whose
+	# times overlap (touching end-to-start counts as a conflict)
+	minutes = lambda t: t.hour * 60 + t.minute
+	for a in ours.meetings:
+		for b in theirs.meetings:
+			if not set(a.days) & set(b.days):
+				continue
+			if minutes(a.start_time) <= minutes(b.end_time) and minutes(b.start_time) <= minutes(a.end_time):
+				return False
+	return True
+
+
+def reference_travel_ok(ours, theirs, minutes):
+	# the plain definition of TravelConstraint: enough time between meetings in different buildings
+	for a in ours.meetings:
+		for b in theirs.meetings:
+			building_a = split_location(a.location)[0]
+			building_b = split_location(b.location)[0]
+			if building_a is None or building_b is None or building_a == building_b:
 				continue
+			if not set(a.days.upper()) & set(b.days.upper()):
+				continue
+			gap = max(minutes_after_midnight(a.start_time), minutes_after_midnight(b.start_time)) - min(minutes_after_midnight(a.end_time), minutes_after_midnight(b.end_time))
+			if gap < minutes:
+				return False
+	return True
+
+
+def reference_schedules(courses, travel_minutes=None):
+	# the slowest, most obvious way to find every schedule: try every combination of sections and
+	# keep the ones where no two sections conflict. returns each schedule as a tuple with one tuple
+	# of CRNs per course, which is what the engines' results get compared against. they come out in
+	# the order the engines have to find them in too: the last course's sections change fastest
+	def ok(a, b):
+		return reference_compatible(a, b) and (travel_minutes is None or reference_travel_ok(a, b, travel_minutes))
+
+	per_course = []
+	for course in courses:
+		if not course.active:
+			continue
+		candidates = []
+		for sections in course.components.values():
+			locked = [section for section in sections if section.lock]
+			if locked:
+				candidates.append(locked[:1])
+			elif [section for section in sections if not section.exclude]:
+				candidates.append([section for section in sections if not section.exclude])
+		combos = []
+		if candidates:
+			for combo in itertools.product(*candidates):
+				if all(ok(a, b) for a, b in itertools.combinations(combo, 2)):
+					combos.append(combo)
+		per_course.append(combos)
+	if not per_course:
+		return []
+
+	schedules = []
+	for choice in itertools.product(*per_course):
+		sections = [section for combo in choice for section in combo]
+		if all(ok(a, b) for a, b in itertools.combinations(sections, 2)):
+			schedules.append(tuple(tuple(section.crn for section in combo) for combo in choice))
+	return schedules
+
+
+def schedule_key(schedule):
+	return tuple(tuple(section.crn for section in course_schedule.sections) for course_schedule in schedule.course_schedules)
+
+
+def engine_find_schedules(courses):
+	return [schedule_key(schedule) for schedule in find_schedules(courses)]
+
+
+def engine_schedule_index(courses):
+	index = find_schedule_index(courses)
+	try:
+		return [schedule_key(index.schedule(k)) for k in range(len(index))]
+	finally:
+		index.close()
 
-			# if the inner loop broke, this loop will also break to save time.
-			break
-		# if there was no inner loop break, then this must be a valid schedule
-		else:
-			possible_schedules.append(CombinedSchedule([c[i].consistent_combos[current_indices[i]] for i in range(num)]))
 
-		index_index = num - 1
-		current_indices[index_index] += 1
+def engine_schedule_index_file(courses):
+	with tempfile.TemporaryDirectory() as directory:
+		index = find_schedule_index(courses, os.path.join(directory, "schedules.bin"))
+		try:
+			return [schedule_key(index.schedule(k)) for k in range(len(index))]
+		finally:
+			index.close()
 
-		
-		while current_indices[index_index] >= lengths[index_index]:
-			current_indices[index_index] = 0
-			index_index -= 1
-			if index_index < 0:
-				return possible_schedules
-			current_indices[index_index] += 1
 
-			
+def engine_schedule_index_spilled(courses):
+	# a tiny budget, so that any real result set ends up on disk
+	index = find_schedule_index(courses, memory_budget=256)
+	try:
+		return [schedule_key(index.schedule(k)) for k in range(len(index))]
+	finally:
+		index.close()
 
-courses = []
 
-print("\n" * 200)
+def engine_chunked(courses):
+	# the search split up the way ScheduleService hands it to its worker processes
+	prepared = prepare_search(courses)
+	if prepared is None:
+		return []
+	c, lengths, compat = prepared
+	return [schedule_key(schedule_from_indices(c, indices)) for prefixes in split_search(lengths, compat, 5) for indices in search_schedule_indices(lengths, compat, prefixes)]
 
 
-while True:
-	print("schedule_scraper.py  Copyright (C) 2021  Matt Lebl")
-	print("This program comes with ABSOLUTELY NO WARRANTY; for details type `warranty'.")
-	print("This is free software, and you are welcome to redistribute it")
-	print("under certain conditions; type `copyright' for details.")
-	print()
-	print()
-	print("Please choose an action.")
-	print("a - add a course, m - manage courses, f - find schedules, e - exit")
+def check_index_ordering(courses):
+	# sorting and ranking have to come out the same whether the sort happens in memory or as an
+	# external merge sort. returns a description of the first difference, or None
+	in_memory = find_schedule_index(courses)
+	spilled = find_schedule_index(courses, memory_budget=256)
 	try:
-		action = input("> ")
-		print("\n" * 200)
-	except EOFError:
-		print("Goodbye")
-		exit()
-	print()
-
-	if action.lower().strip() == 'warranty':
-		print("There is no warranty for the program, to the extent permitted by applicable law. Except when")
-		print("otherwise stated in writing the copyright holders and/or other parties provide the program")
-		print("\"as is\" without warranty of any kind, either expressed or implied, including, but not limited")
-		print("to, the implied warranties of merchantability and fitness for a particular purpose. The entire")
-		print("risk as to the quality and performance of the program is with you. Should the program prove")
-		print("defective, you assume the cost of all necessary servicing, repair or correction.")
-		print()
-		print("(In essence, this means please double check any schedules you generate before you try to register them!)")
-		print()
-		
-	elif action.lower().strip() == 'copyright':
-		print("This program is free software---you are welcome to distribute it and modify it subject to")
-		print("the terms of the Affero GPL available here: https://www.gnu.org/licenses/agpl-3.0.html")
-		print()
-	elif action.lower().strip() == 'a':
-		url = input("Paste schedule link: ")
+		steps = [
+			("sort by end", lambda index: index.sort("end")),
+			("sort by start, reversed", lambda index: index.sort("start", reverse=True)),
+			("rank", lambda index: index.rank({"days_off": 2, "gaps": 1, "instructors": 1}, {"instructor 1": 1})),
+			("sort by days off, reversed", lambda index: index.sort("days_off", reverse=True)),
+		]
+		for name, step in steps:
+			step(in_memory)
+			step(spilled)
+			if [in_memory.combo_indices(k) for k in range(len(in_memory))] != [spilled.combo_indices(k) for k in range(len(spilled))]:
+				return "the external sort disagrees after: %s" % name
+		return None
+	finally:
+		in_memory.close()
+		spilled.close()
+
+
+def check_travel_constraint(courses, minutes=15):
+	# searching with a TravelConstraint has to agree with the reference's plain travel check
+	expected = sorted(reference_schedules(courses, minutes))
+	constraint = CatalogIndex(courses).travel_constraint(minutes)
+	got = sorted(schedule_key(schedule) for schedule in find_schedules(courses, constraint))
+	if got != expected:
+		return "with a %d minute travel time, find_schedules found %d schedules and the reference found %d" % (minutes, len(got), len(expected))
+	return None
+
+
+def engine_schedule_index_progress(courses):
+	# the way the menu searches: with a SearchProgress, here updated on every step
+	prepared = prepare_search(courses)
+	if prepared is None:
+		return []
+	c, lengths, compat = prepared
+	progress = SearchProgress(c, lengths)
+	progress.update_every = 1
+	index = build_schedule_index(c, lengths, compat, progress=progress)
+	try:
+		# the preview has to be the same as the start of the results
+		if progress.preview != [index.combo_indices(k) for k in range(min(len(index), progress.preview_limit))]:
+			return []
+		return [schedule_key(index.schedule(k)) for k in range(len(index))]
+	finally:
+		index.close()
+
+
+def check_search_progress(courses, rng):
+	# a search's progress has to add up, and cancelling it part way has to stop it with what it had
+	# found so far being the start of the full results. returns a description of the first problem,
+	# or None
+	prepared = prepare_search(courses)
+	if prepared is None:
+		return None
+	c, lengths, compat = prepared
+	expected = list(iter_schedule_indices(lengths, compat))
+
+	progress = SearchProgress(c, lengths)
+	progress.update_every = 1
+	fractions = []
+	found = []
+	for indices in iter_schedule_indices(lengths, compat, progress):
+		fractions.append(progress.fraction)
+		found.append(indices)
+	if found != expected or progress.fraction != 1.0 or progress.examined < len(found):
+		return "searching with a SearchProgress went wrong (found %d of %d schedules)" % (len(found), len(expected))
+	if fractions != sorted(fractions) or not all(0 <= fraction <= 1 for fraction in fractions):
+		return "a search's progress went backwards or out of range: %s" % fractions
+
+	if not expected:
+		return None
+	stop = rng.randrange(len(expected))
+	progress = SearchProgress(c, lengths)
+	progress.update_every = 1
+	found = []
+	for indices in iter_schedule_indices(lengths, compat, progress):
+		found.append(indices)
+		if len(found) == stop + 1:
+			progress.cancelled.set()
+	if found != expected[:stop + 1]:
+		return "cancelling after %d schedules left %d of them" % (stop + 1, len(found))
+	progress = SearchProgress(c, lengths)
+	progress.update_every = 1
+	progress.cancelled.set()
+	if build_schedule_index(c, lengths, compat, progress=progress) is not None:
+		return "a cancelled search still returned its results"
+	return None
+
+
+# every way the program has of finding schedules, checked against reference_schedules by
+# run_differential_tests. new engines should be added here
+SOLVER_ENGINES = [
+	("find_schedules", engine_find_schedules),
+	("ScheduleIndex", engine_schedule_index),
+	("ScheduleIndex (file)", engine_schedule_index_file),
+	("ScheduleIndex (spilled)", engine_schedule_index_spilled),
+	("ScheduleIndex (progress)", engine_schedule_index_progress),
+	("chunked", engine_chunked),
+]
+
+
+def print_fuzz_case(courses):
+	for course in courses:
+		print("  %s (%s)" % (course.code, "active" if course.active else "inactive"))
+		for section in course.all_sections():
+			print("    %s%s%s" % (section, " (locked)" if section.lock else "", " (excluded)" if section.exclude else ""))
+
+
+def run_differential_tests(cases, seed=None, max_courses=4):
+	# generate random course loads, run the reference enumerator and every engine on each, and
+	# check that they all agree. returns True if nothing disagreed
+	if seed is None:
+		seed = random.randrange(1 << 32)
+	print("Running %d random cases with seed %d." % (cases, seed))
+	rng = random.Random(seed)
+	timings = {name: 0.0 for name, _ in SOLVER_ENGINES}
+	reference_time = 0.0
+	failures = 0
+	total_schedules = 0
+
+	for case in range(cases):
+		courses = [random_course_offering(rng, number) for number in range(rng.randint(1, max_courses))]
+
+		for course in courses:
+			sections = course.all_sections()
+			for ours in sections:
+				for theirs in sections:
+					if ours.compatible_with(theirs) != reference_compatible(ours, theirs):
+						print("Case %d: compatible_with disagrees for %s and %s" % (case, ours, theirs))
+						failures += 1
+
+		started = time.perf_counter()
+		expected = reference_schedules(courses)
+		reference_time += time.perf_counter() - started
+		total_schedules += len(expected)
+
+		for name, engine in SOLVER_ENGINES:
+			started = time.perf_counter()
+			got = engine(courses)
+			timings[name] += time.perf_counter() - started
+			if sorted(got) != sorted(expected):
+				failures += 1
+				print("Case %d: %s found %d schedules, the reference found %d." % (case, name, len(got), len(expected)))
+				print_fuzz_case(courses)
+			elif got != expected:
+				# the schedules were right but came out in the wrong order
+				failures += 1
+				print("Case %d: %s found the right schedules in a different order." % (case, name))
+				print_fuzz_case(courses)
+
+		for problem in (check_index_ordering(courses), check_travel_constraint(courses), check_search_progress(courses, rng)):
+			if problem is not None:
+				failures += 1
+				print("Case %d: %s" % (case, problem))
+				print_fuzz_case(courses)
+
+	print("Checked %d schedules in total." % total_schedules)
+	for name, _ in SOLVER_ENGINES:
+		ratio = timings[name] / reference_time if reference_time > 0 else 0.0
+		print("  %-24s %8.3fs  (%.2fx the reference's time)" % (name, timings[name], ratio))
+	if failures:
+		print("%d disagreements! Rerun with --seed %d to reproduce them." % (failures, seed))
+	else:
+		print("Every engine agreed with the reference.")
+	return failures == 0
+
+
+LISTING_URL = "https://www.uvic.ca/BAN1P/bwckctlg.p_disp_listcrse?term_in=%(term)s&subj_in=%(subject)s&crse_in=%(number)s&schd_in="
+
+
+def parse_course_spec(spec):
+	# turns "CSC 370" or "CSC370" into ("CSC", "370")
+	m = re.match(r"^\s*([A-Za-z]+)\s*(\d+\w*)\s*$", spec)
+	if m is None:
+		raise ValueError("not a course code: %s" % spec)
+	return m.group(1).upper(), m.group(2).upper()
+
+
+class CourseLoader:
+	# fetches and parses course listings through one shared connection pool, so loading the same
+	# template for several terms doesn't pay for a new connection each time. listings are cached by
+	# url, which only saves anything when the same listing is asked for twice
+
+	def __init__(self, listing_url=LISTING_URL, workers=8):
+		self.listing_url = listing_url
+		self.session = requests.Session()
+		adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+		self.session.mount("http://", adapter)
+		self.session.mount("https://", adapter)
+		self.workers = workers
+		self.cache = {}
+		self.cache_lock = threading.Lock()
+
+	def url_for(self, term, spec):
+		subject, number = parse_course_spec(spec)
+		return self.listing_url % {"term": term, "subject": subject, "number": number}
+
+	def load(self, url):
+		with self.cache_lock:
+			if url in self.cache:
+				return self.cache[url]
+			future = self.cache[url] = concurrent.futures.Future()
+		try:
+			future.set_result(parse_course_from_url(url, self.session))
+		except (Exception, SystemExit) as e:
+			future.set_exception(ValueError("couldn't read a course listing from %s (%s)" % (url, e)))
+		return future
+
+	def load_terms(self, terms, template):
+		# fetch every (term, course) listing at once. returns {term: [(spec, future), ...]}
+		with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
+			jobs = {}
+			for term in terms:
+				jobs[term] = [(spec, pool.submit(self.load, self.url_for(term, spec))) for spec in template]
+			return {term: [(spec, job.result()) for spec, job in jobs[term]] for term in terms}
+
+
+def search_schedule_rows(c, lengths, compat):
+	# a whole search, metrics and all, returned as ScheduleIndex rows. like search_schedule_indices,
+	# this is here so that it can be handed off to a worker process
+	index = build_schedule_index(c, lengths, compat)
+	rows = index.rows
+	index.close()
+	return rows
+
+
+class TermPlan:
+	def __init__(self, term, courses, missing, prepared, rows):
+		self.term = term
+		self.courses = courses
+		self.missing = missing
+		self.prepared = prepared
+		self.rows = rows
+
+	def index(self):
+		if self.prepared is None:
+			return ScheduleIndex([]).finish()
+		index = ScheduleIndex(self.prepared[0])
+		index.add_rows(self.rows)
+		return index.finish()
+
+
+def plan_terms(terms, template, loader=None, workers=None):
+	# load the same course template for each term and search all of the terms' schedules
+	# concurrently, one worker process per term. the workers measure the schedules they find too,
+	# so all that's left for this process is putting the rows into a ScheduleIndex
+	if loader is None:
+		loader = CourseLoader()
+	loaded = loader.load_terms(terms, template)
+
+	plans = []
+	with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+		searches = []
+		for term in terms:
+			courses = []
+			missing = []
+			for spec, future in loaded[term]:
+				try:
+					courses.append(future.result())
+				except ValueError:
+					missing.append(spec)
+			prepared = prepare_search(courses) if courses else None
+			search = None
+			if prepared is not None:
+				search = pool.submit(search_schedule_rows, *prepared)
+			searches.append((term, courses, missing, prepared, search))
+
+		for term, courses, missing, prepared, search in searches:
+			rows = search.result() if search is not None else array.array('I')
+			plans.append(TermPlan(term, courses, missing, prepared, rows))
+	return plans
+
+
+def print_term_plans(plans, show=1):
+	combined = 1
+	for plan in plans:
+		print("Term %s:" % plan.term)
+		for course in plan.courses:
+			print("  %s: %s" % (course.code, course.title))
+		for spec in plan.missing:
+			print("  %s: not offered (or couldn't be read)" % spec)
+		index = plan.index()
+		print("I found %d possible schedules." % len(index))
+		if len(index) > 0:
+			print_schedule_summary(index)
+			for k in range(min(show, len(index))):
+				for course_schedule in index.schedule(k).course_schedules:
+					print("  %s" % course_schedule.section_and_crn())
+				print()
+		combined *= len(index)
 		print()
+	print("Across all %d terms there are %d possible combinations of schedules." % (len(plans), combined))
+
+
+def toggle_lock_section(course, number):
+	component, index = course.locate_section(number)
+	course.toggle_lock(component, index)
+
+
+def meeting_to_dict(meeting):
+	return {
+		"days": meeting.days,
+		"start": meeting.start_time.strftime(r"%H:%M"),
+		"end": meeting.end_time.strftime(r"%H:%M"),
+		"location": meeting.location,
+		"instructor": meeting.instructor,
+	}
+
+
+def section_to_dict(section):
+	return {
+		"crn": section.crn,
+		"section_code": section.section_code,
+		"lock": section.lock,
+		"exclude": section.exclude,
+		"meetings": [meeting_to_dict(meeting) for meeting in section.meetings],
+	}
+
+
+def course_to_dict(course):
+	return {
+		"code": course.code,
+		"title": course.title,
+		"active": course.active,
+		"sections": [section_to_dict(section) for section in course.all_sections()],
+	}
+
+
+def schedule_to_dict(schedule):
+	return {
+		"courses": [
+			{
+				"code": course_schedule.course.code,
+				"sections": [
+					{"crn": section.crn, "section_code": section.section_code}
+					for section in course_schedule.sections
+				],
+			}
+			for course_schedule in schedule.course_schedules
+		],
+		"earliest_start": schedule.find_earliest_start().strftime(r"%H:%M"),
+		"latest_end": schedule.find_latest_end().strftime(r"%H:%M"),
+		"days_off": schedule.count_days_off(),
+	}
+
+
+SEAT_URL = "https://www.uvic.ca/BAN1P/bwckschd.p_disp_detail_sched?term_in=%(term)s&crn_in=%(crn)d"
+
+
+def term_from_url(url):
+	term = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query).get("term_in")
+	if not term:
+		raise ValueError("no term in %s" % url)
+	return term[0]
+
+
+def parse_seats_from_html(html):
+	# reads the "Registration Availability" table off a section detail page. returns a dict with
+	# the section's title line and (capacity, actual, remaining) tuples for its seats and waitlist
+	soup = bs(html, features="html.parser")
+	result = {"title": None, "seats": None, "waitlist": None}
+
+	title_string = soup.find(string=re.compile(r".+ - \d+ - .+ - \S+"))
+	if title_string is not None:
+		result["title"] = title_string.strip()
+
+	for caption in soup.find_all('caption'):
+		if caption.get_text().strip() != 'Registration Availability':
+			continue
+		for row in caption.parent.find_all("tr"):
+			label = row.find("th")
+			columns = row.find_all("td")
+			if label is None or len(columns) != 3:
+				continue
+			numbers = tuple(int(column.get_text().strip()) for column in columns)
+			label = label.get_text().strip().lower()
+			if label.startswith("waitlist"):
+				result["waitlist"] = numbers
+			elif label.startswith("seats"):
+				result["seats"] = numbers
+
+	if result["seats"] is None:
+		raise ValueError("no seating information on this page")
+	return result
+
+
+class RateLimiter:
+	# spaces requests to each host at least 1/rate seconds apart, across all threads
+
+	def __init__(self, rate):
+		self.interval = 1.0 / rate if rate > 0 else 0.0
+		self.next_slot = {}
+		self.lock = threading.Lock()
+
+	def wait(self, url):
+		host = urllib.parse.urlsplit(url).netloc
+		with self.lock:
+			now = time.monotonic()
+			slot = max(now, self.next_slot.get(host, now))
+			self.next_slot[host] = slot + self.interval
+		if slot > now:
+			time.sleep(slot - now)
+
+
+class SeatChange:
+	def __init__(self, section, kind, old, new):
+		self.section = section
+		self.kind = kind
+		self.old = old
+		self.new = new
+
+	def opened(self):
+		# seats went from none left to some left
+		return self.old is not None and self.old[2] <= 0 and self.new[2] > 0
+
+	def __str__(self):
+		describe = lambda x: "unknown" if x is None else "%d of %d left" % (x[2], x[0])
+		s = "%d %s %s: %s %s -> %s" % (
+			self.section.crn,
+			self.section.course_code,
+			self.section.section_code,
+			"waitlist" if self.kind == "waitlist" else "seats",
+			describe(self.old),
+			describe(self.new)
+		)
+		if self.opened():
+			s += " (open!)"
+		return s
+
+	def __repr__(self):
+		return str(self)
+
+
+class SeatWatcher:
+	# polls the detail page of each watched section and reports only what changed. every page is
+	# requested conditionally (ETag/Last-Modified), so an unchanged section costs a 304 and no
+	# parsing. requests share one connection pool and are rate limited per host.
+
+	def __init__(self, seat_url=SEAT_URL, rate=2.0, workers=4, session=None):
+		self.seat_url = seat_url
+		if session is None:
+			session = requests.Session()
+			adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+			session.mount("http://", adapter)
+			session.mount("https://", adapter)
+		self.session = session
+		self.limiter = RateLimiter(rate)
+		self.workers = workers
+		self.watched = {}
+		self.validators = {}
+
+	def watch(self, section, term):
+		self.watched[(term, section.crn)] = section
+
+	def watch_course(self, course, term=None):
+		if term is None:
+			term = term_from_url(course.url)
+		for section in course.all_sections():
+			self.watch(section, term)
+
+	def unwatch(self, section, term):
+		url = self.seat_url % {"term": term, "crn": section.crn}
+		self.watched.pop((term, section.crn), None)
+		self.validators.pop(url, None)
+
+	def fetch(self, url):
+		# returns the page text along with its (etag, last-modified) validators, or None if it hasn't
+		# changed since we last saw it
+		headers = {}
+		etag, modified = self.validators.get(url, (None, None))
+		if etag is not None:
+			headers["If-None-Match"] = etag
+		if modified is not None:
+			headers["If-Modified-Since"] = modified
+		self.limiter.wait(url)
+		r = self.session.get(url, headers=headers, timeout=30)
+		if r.status_code == 304:
+			return None
+		r.raise_for_status()
+		return r.text, (r.headers.get("ETag"), r.headers.get("Last-Modified"))
+
+	def check(self, term, section):
+		url = self.seat_url % {"term": term, "crn": section.crn}
+		page = self.fetch(url)
+		if page is None:
+			return []
+		html, validators = page
+		seats = parse_seats_from_html(html)
+		# only remembered once the page turned out to be readable. otherwise an error page would be
+		# answered with a 304 from then on, and the section would never be read again
+		self.validators[url] = validators
+
+		if not section.section_code and seats["title"] is not None:
+			# sections watched by CRN alone pick up their names from the detail page
+			m = re.search(r"(.+) - (\d+) - (.+) - (\S+)", seats["title"])
+			if m is not None:
+				section.course_code = m.group(3)
+				section.section_code = m.group(4)
+
+		changes = []
+		for kind in ("seats", "waitlist"):
+			if seats[kind] is not None and seats[kind] != getattr(section, kind):
+				changes.append(SeatChange(section, kind, getattr(section, kind), seats[kind]))
+				setattr(section, kind, seats[kind])
+		return changes
+
+	def poll(self):
+		# check every watched section once. returns (changes, errors)
+		changes = []
+		errors = []
+		with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
+			jobs = [(section, pool.submit(self.check, term, section)) for (term, crn), section in list(self.watched.items())]
+			for section, job in jobs:
+				try:
+					changes += job.result()
+				except (requests.RequestException, ValueError) as e:
+					errors.append((section, e))
+		return changes, errors
+
+	def run(self, interval, on_change, on_error=None, stop=None):
+		# poll every `interval` seconds until `stop` (a threading.Event) is set
+		if stop is None:
+			stop = threading.Event()
+		while not stop.is_set():
+			started = time.monotonic()
+			changes, errors = self.poll()
+			for change in changes:
+				on_change(change)
+			if on_error is not None:
+				for section, error in errors:
+					on_error(section, error)
+			stop.wait(max(0.0, interval - (time.monotonic() - started)))
+
+
+def seat_page_html(section, seats, waitlist):
+	# a made-up section detail page, laid out like the registration site's
+	return (
+		"<html><body><table><tr><th>Made-up section - %d - %s - %s</th></tr></table>"
+		"<table><caption>Registration Availability</caption>"
+		"<tr><td></td><th>Capacity</th><th>Actual</th><th>Remaining</th></tr>"
+		"<tr><th>Seats</th><td>%d</td><td>%d</td><td>%d</td></tr>"
+		"<tr><th>Waitlist Seats</th><td>%d</td><td>%d</td><td>%d</td></tr>"
+		"</table></body></html>"
+	) % ((section.crn, section.course_code, section.section_code) + seats + waitlist)
+
+
+class SeatFixtureHandler(http.server.BaseHTTPRequestHandler):
+	# serves the server's pages (a dict of crn -> (version, html)) for check_seat_watcher, with the
+	# version as the ETag, and counts the requests it gets and the ones it answers with a 304
+
+	def do_GET(self):
+		query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+		with self.server.lock:
+			self.server.requests += 1
+			page = self.server.pages.get(int(query.get("crn_in", ["0"])[0]))
+		if page is None:
+			self.send_response(404)
+			self.end_headers()
+			return
+		version, html = page
+		etag = '"%d"' % version
+		if self.headers.get("If-None-Match") == etag:
+			with self.server.lock:
+				self.server.not_modified += 1
+			self.send_response(304)
+			self.end_headers()
+			return
+		body = html.encode("utf-8")
+		self.send_response(200)
+		self.send_header("ETag", etag)
+		self.send_header("Content-Type", "text/html")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+
+def check_seat_watcher():
+	# runs a SeatWatcher against a local fixture server, changing the pages between polls. returns
+	# a description of the first problem, or None
+	server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SeatFixtureHandler)
+	server.lock = threading.Lock()
+	server.requests = 0
+	server.not_modified = 0
+	server.pages = {}
+	thread = threading.Thread(target=server.serve_forever, daemon=True)
+	thread.start()
+	try:
+		sections = [Section(30001, "A01", "SEA 100", []), Section(30002, "A02", "SEA 100", []), Section(30003, "B01", "SEA 100", [])]
+		course = CourseOffering("Seat course", "SEA 100", {"A": sections[:2], "B": sections[2:]})
+		course.url = "http://127.0.0.1:%d/listing?term_in=202109&subj_in=SEA&crse_in=100" % server.server_address[1]
+		seats = {30001: (30, 30, 0), 30002: (30, 12, 18), 30003: (20, 5, 15)}
+		version = 0
+
+		def publish(crn, html=None):
+			nonlocal version
+			version += 1
+			section = sections[crn - 30001]
+			with server.lock:
+				server.pages[crn] = (version, html or seat_page_html(section, seats[crn], (10, 0, 10)))
+
+		def poll(expected_requests):
+			with server.lock:
+				server.requests = server.not_modified = 0
+			changes, errors = watcher.poll()
+			with server.lock:
+				if server.requests != expected_requests:
+					raise ValueError("%d requests where %d were expected" % (server.requests, expected_requests))
+				return changes, errors, server.not_modified
+
+		for crn in seats:
+			publish(crn)
+		watcher = SeatWatcher("http://127.0.0.1:%d/seats?term_in=%%(term)s&crn_in=%%(crn)d" % server.server_address[1], 0)
+		watcher.watch_course(course)
+
+		changes, errors, not_modified = poll(3)
+		if errors or len(changes) != 6 or [section.seats for section in sections] != list(seats.values()):
+			return "the first poll found %d changes and %d errors, and read the seats as %s" % (len(changes), len(errors), [section.seats for section in sections])
+
+		changes, errors, not_modified = poll(3)
+		if changes or errors or not_modified != 3:
+			return "nothing changed, but a poll found %d changes and %d errors, with %d 304s" % (len(changes), len(errors), not_modified)
+
+		seats[30001] = (30, 29, 1)
+		publish(30001)
+		changes, errors, not_modified = poll(3)
+		if errors or len(changes) != 1 or changes[0].section is not sections[0] or not changes[0].opened() or not_modified != 2:
+			return "after a seat opened up, a poll found %s and %d errors" % (changes, len(errors))
+
+		# the site down for maintenance. the page isn't readable, so it has to be asked for in full
+		# (and found wanting) every time, not answered with a 304
+		publish(30002, "<html><body>Down for maintenance</body></html>")
+		for _ in range(2):
+			changes, errors, not_modified = poll(3)
+			if changes or len(errors) != 1 or errors[0][0] is not sections[1] or not_modified != 2:
+				return "a maintenance page gave %s and %d errors, with %d 304s" % (changes, len(errors), not_modified)
+		publish(30002)
+		changes, errors, not_modified = poll(3)
+		if changes or errors or not_modified != 2:
+			return "once the maintenance was over, a poll found %s and %d errors, with %d 304s" % (changes, len(errors), not_modified)
+
+		watcher.unwatch(sections[2], "202109")
+		seats[30003] = (20, 20, 0)
+		publish(30003)
+		changes, errors, not_modified = poll(2)
+		if changes or errors:
+			return "a section that isn't watched any more was still reported: %s" % changes
+	except (requests.RequestException, ValueError) as e:
+		return "the seat watcher went wrong: %s" % e
+	finally:
+		server.shutdown()
+		server.server_close()
+	return None
+
+
+class HTTPError(Exception):
+	def __init__(self, status, message):
+		super().__init__(message)
+		self.status = status
+		self.message = message
+
+
+def prepare_snapshot(courses):
+	# prepare_search, plus the combo lists it found. the next prepare_search replaces each course's
+	# consistent_combos, so results from this one have to be read from these instead
+	prepared = prepare_search(courses)
+	if prepared is None:
+		return None
+	c, lengths, compat = prepared
+	return c, lengths, compat, [course.consistent_combos for course in c]
+
+
+class ScheduleService:
+	# keeps the loaded courses, their combos and the compatibility index warm between requests.
+	# every change to the courses bumps the version, which throws away whatever was cached for the
+	# old version. searches run in a process pool and preparing them runs in a thread, so a big one
+	# doesn't hold up the event loop. each search is split into chunks that go to the pool one by
+	# one, so pages near the start can be served before the whole search is done, and a search
+	# that's gone out of date can be dropped without waiting for it to finish
+
+	# how many chunks a search is split into, for each worker process
+	chunks_per_worker = 16
+
+	reasons = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+	def __init__(self, workers=None):
+		self.courses = []
+		self.version = 0
+		self.prepared = None
+		self.preparing = asyncio.Lock()
+		self.search = None
+		self.workers = workers or os.cpu_count() or 1
+		self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+
+	def changed(self):
+		self.version += 1
+		self.prepared = None
+		# chunks of the old search that haven't started yet are dropped. a request still waiting on
+		# one of them starts over with the new search
+		if self.search is not None:
+			for chunk in self.search[2]:
+				chunk.cancel()
+		self.search = None
+
+	async def prepare(self):
+		# one prepare at a time, since each one sets the courses' consistent_combos. if the courses
+		# change while it's running, what it found is out of date and it has to be done again
+		async with self.preparing:
+			while self.prepared is None or self.prepared[0] != self.version:
+				version = self.version
+				prepared = await asyncio.get_running_loop().run_in_executor(None, prepare_snapshot, list(self.courses))
+				if version == self.version:
+					self.prepared = (version, prepared)
+			return self.prepared[1]
+
+	async def find_schedule_indices(self):
+		# returns what the search for the current courses was prepared from, and its chunks: futures
+		# for each chunk's index tuples, in order. requests that come in while a search is running
+		# share it rather than starting another
+		if self.search is None or self.search[0] != self.version:
+			prepared = await self.prepare()
+			# another request may have started the search while we were waiting
+			if self.search is None or self.search[0] != self.version:
+				chunks = []
+				if prepared is not None:
+					c, lengths, compat, combos = prepared
+					loop = asyncio.get_running_loop()
+					for prefixes in split_search(lengths, compat, self.workers * self.chunks_per_worker):
+						chunks.append(loop.run_in_executor(self.pool, search_schedule_indices, lengths, compat, prefixes))
+				self.search = (self.version, prepared, chunks)
+		version, prepared, chunks = self.search
+		return prepared, chunks
+
+	async def schedule_page(self, offset, limit):
+		# the index tuples from offset to offset + limit, waiting only for the chunks they're in.
+		# returns what the search was prepared from, the page, and the total number of schedules
+		# (or None if the search isn't done yet)
+		while True:
+			prepared, chunks = await self.find_schedule_indices()
+			page = []
+			start = 0
+			superseded = False
+			for chunk in chunks:
+				if start >= offset + limit:
+					break
+				# asyncio.wait, unlike awaiting the chunk, doesn't give up if the chunk is cancelled
+				await asyncio.wait([chunk])
+				if chunk.cancelled():
+					superseded = True
+					break
+				indices = chunk.result()
+				page += indices[max(0, offset - start):offset + limit - start]
+				start += len(indices)
+			if superseded:
+				continue
+			total = None
+			if all(chunk.done() and not chunk.cancelled() for chunk in chunks):
+				total = sum(len(chunk.result()) for chunk in chunks)
+			return prepared, page, total
+
+	def get_course(self, number):
+		try:
+			number = int(number)
+			if number < 0:
+				raise IndexError
+			return self.courses[number]
+		except (ValueError, IndexError):
+			raise HTTPError(404, "no such course: %s" % number)
+
+	def get_section(self, course, number):
+		sections = course.all_sections()
+		try:
+			number = int(number)
+			if number < 0:
+				raise IndexError
+			return number, sections[number]
+		except (ValueError, IndexError):
+			raise HTTPError(404, "no such section: %s" % number)
+
+	async def handle(self, method, path, query, body):
+		parts = [part for part in path.split("/") if part]
+
+		if parts == ["courses"]:
+			if method == "GET":
+				return 200, [course_to_dict(course) for course in self.courses]
+			if method == "POST":
+				if not isinstance(body, dict) or "url" not in body:
+					raise HTTPError(400, "expected a JSON object with a \"url\"")
+				try:
+					course = await asyncio.get_running_loop().run_in_executor(None, parse_course_from_url, body["url"])
+				except (Exception, SystemExit):
+					raise HTTPError(400, "there was a problem reading the course information from that url")
+				self.courses.append(course)
+				self.changed()
+				return 201, course_to_dict(course)
+			raise HTTPError(405, "use GET or POST")
+
+		if len(parts) == 2 and parts[0] == "courses":
+			course = self.get_course(parts[1])
+			if method == "GET":
+				return 200, course_to_dict(course)
+			if method == "DELETE":
+				self.courses.remove(course)
+				self.changed()
+				return 200, {"deleted": course.code}
+			raise HTTPError(405, "use GET or DELETE")
+
+		if len(parts) == 3 and parts[0] == "courses" and parts[2] == "active":
+			course = self.get_course(parts[1])
+			if method != "POST":
+				raise HTTPError(405, "use POST")
+			if isinstance(body, dict) and "active" in body:
+				course.active = bool(body["active"])
+			else:
+				course.active = not course.active
+			self.changed()
+			return 200, course_to_dict(course)
+
+		if len(parts) == 5 and parts[0] == "courses" and parts[2] == "sections" and parts[4] in ("lock", "exclude"):
+			course = self.get_course(parts[1])
+			number, section = self.get_section(course, parts[3])
+			if method != "POST":
+				raise HTTPError(405, "use POST")
+			if parts[4] == "lock":
+				toggle_lock_section(course, number)
+			else:
+				section.toggle_exclude()
+			self.changed()
+			return 200, section_to_dict(section)
+
+		if parts == ["schedules"]:
+			if method != "GET":
+				raise HTTPError(405, "use GET")
+			try:
+				offset = int(query.get("offset", ["0"])[0])
+				limit = int(query.get("limit", ["20"])[0])
+			except ValueError:
+				raise HTTPError(400, "offset and limit must be numbers")
+			if offset < 0 or limit < 0:
+				raise HTTPError(400, "offset and limit can't be negative")
+			prepared, page, total = await self.schedule_page(offset, limit)
+			# only the schedules on this page are ever built into CombinedSchedule objects, from the
+			# combos as they were when this search was prepared
+			combos = prepared[3] if prepared is not None else []
+			schedules = [schedule_to_dict(CombinedSchedule([combos[k][i] for k, i in enumerate(indices)])) for indices in page]
+			return 200, {"total": total, "offset": offset, "limit": limit, "schedules": schedules}
+
+		raise HTTPError(404, "no such endpoint: %s" % path)
+
+	async def serve_client(self, reader, writer):
+		try:
+			request_line = await reader.readline()
+			headers = {}
+			while True:
+				line = await reader.readline()
+				if line in (b"\r\n", b"\n", b""):
+					break
+				name, _, value = line.decode("latin-1").partition(":")
+				headers[name.strip().lower()] = value.strip()
+
+			try:
+				method, target, _ = request_line.decode("latin-1").split()
+				body = None
+				length = int(headers.get("content-length", "0"))
+				if length:
+					body = json.loads(await reader.readexactly(length))
+			except ValueError:
+				status, payload = 400, {"error": "malformed request"}
+			else:
+				url = urllib.parse.urlsplit(target)
+				try:
+					status, payload = await self.handle(method.upper(), url.path, urllib.parse.parse_qs(url.query), body)
+				except HTTPError as e:
+					status, payload = e.status, {"error": e.message}
+				except Exception as e:
+					status, payload = 500, {"error": "something went wrong: %s" % e}
+
+			data = json.dumps(payload).encode("utf-8")
+			writer.write(b"HTTP/1.1 %d %s\r\n" % (status, self.reasons[status].encode("latin-1")))
+			writer.write(b"Content-Type: application/json\r\n")
+			writer.write(b"Content-Length: %d\r\n" % len(data))
+			writer.write(b"Connection: close\r\n\r\n")
+			writer.write(data)
+			await writer.drain()
+		except (ConnectionError, asyncio.IncompleteReadError):
+			pass
+		finally:
+			writer.close()
+
+	async def serve(self, host, port):
+		server = await asyncio.start_server(self.serve_client, host, port)
+		print("Serving schedules on http://%s:%d/ (ctrl-c to stop)" % (host, port))
+		async with server:
+			await server.serve_forever()
+
+
+def run_in_thread(function, *args):
+	# runs function(*args) on a daemon thread and returns an asyncio future for the result. nothing
+	# waits for a daemon thread when the program exits, so an input() or a fetch that's still going
+	# can't hold up quitting (say, with ctrl-c) the way an executor's threads would
+	loop = asyncio.get_running_loop()
+	future = loop.create_future()
+
+	def settle(outcome, value):
+		if not future.done():
+			outcome(value)
+
+	def run():
+		try:
+			outcome, value = future.set_result, function(*args)
+		except BaseException as e:
+			outcome, value = future.set_exception, e
+		try:
+			loop.call_soon_threadsafe(settle, outcome, value)
+		except RuntimeError:
+			# the loop has already gone away
+			pass
+
+	threading.Thread(target=run, daemon=True).start()
+	return future
+
+
+async def ask(prompt):
+	# input() without holding up the event loop, so background jobs carry on while we wait
+	return await run_in_thread(input, prompt)
+
+
+async def view_schedules(schedules, catalog, search=None):
+	# page through a ScheduleIndex, or the preview of a search that's still running (in which case
+	# search is its BackgroundJob)
+	selected = 0
+	while True:
+		# only the schedule on screen is ever built
+		schedule = schedules.schedule(selected)
+		schedule.print_calendar()
+		for course_schedule in schedule.course_schedules:
+			print(course_schedule.section_and_crn())
+		for day, building, first, second in catalog.back_to_back(schedule.condense_sections()):
+			print("Back to back in %s on %s: %s %s then %s %s" % (building, day, first.course_code, first.section_code, second.course_code, second.section_code))
+		if search is not None and search.running():
+			print("Viewing schedule (%d of the first %d found so far)" % (selected + 1, len(schedules)))
+			print(search.status())
+		else:
+			print("Viewing schedule (%d of %d)" % (selected + 1, len(schedules)))
+		print("n - next, b - back, e - exit, # - jump to schedule number")
 		try:
-			course = parse_course_from_url(url)
+			action = await ask("> ")
+			print("\n" * 200)
+		except EOFError:
+			print("Goodbye")
+			exit()
+
+		if action.lower().strip() == 'n':
+			selected = (selected + 1) % len(schedules)
+		elif action.lower().strip() == 'b':
+			selected = (selected - 1) % len(schedules)
+		elif action.lower().strip() == 'e':
+			break
+		else:
+			try:
+				num = int(action)
+			except:
+				print("Sorry, I didn't understand that.")
+				continue
+
+			if num > len(schedules) or num < 1:
+				print("Sorry, there are only %d schedules." % len(schedules))
+				continue
+
+			selected = num - 1
+
+
+async def run_menu(args, background, jobs, indexes):
+	# the interactive menu. anything slow runs as a BackgroundJob added to jobs, so it can be
+	# watched and cancelled from here: searches on the background thread pool, and fetches on
+	# daemon threads of their own. every index a search finishes is kept in indexes until it's
+	# closed, so whoever called us can close whatever is left (and its scratch files) at the end
+	loop = asyncio.get_running_loop()
+	courses = []
+	schedules = None
+	# the search that's running (or finished, but not looked at yet), if there is one
+	search = None
+	# counts every change to the courses. a search remembers the count it started at, and is
+	# started again if the courses have changed since
+	changes = 0
+	search_changes = 0
+	# instructors, buildings and rooms of every added course, kept up to date as courses come and go
+	catalog = CatalogIndex()
+	# things background jobs want to tell the user, shown next time the main menu comes up. each is
+	# a message along with a course whose sections should be shown, or None
+	notices = []
+	# courses being watched for open seats (along with their terms), and the job polling them
+	watcher = SeatWatcher(args.seat_url, args.rate)
+	watched = {}
+	watching = None
+
+	def course_fetched(future, url):
+		nonlocal changes
+		if future.cancelled():
+			notices.append(("Stopped fetching %s." % url, None))
+			return
+		try:
+			course = future.result()
 		except:
-			print("There was a problem reading the course information! May you please double check")
-			print("that you're entering a course schedule url? These should point to a white page")
-			print("containing some tables with the section info. Here's an example:")
-			print("https://www.uvic.ca/BAN1P/bwckctlg.p_disp_listcrse?term_in=202109&subj_in=CSC&crse_in=370&schd_in=")
-			continue
+			notices.append(("There was a problem reading the course information from %s!\n"
+				"May you please double check that you're entering a course schedule url? These should point\n"
+				"to a white page containing some tables with the section info. Here's an example:\n"
+				"https://www.uvic.ca/BAN1P/bwckctlg.p_disp_listcrse?term_in=202109&subj_in=CSC&crse_in=370&schd_in=" % url, None))
+			return
 		courses.append(course)
-		print("Added %s: %s. Please ensure the following details are correct." % (course.code, course.title))
-		print_sections(course)
-	elif action.lower().strip() == 'm':
-		if len(courses) == 0:
-			print("You do not yet have any courses registered! I'll be happy to help you manage")
-			print("them after you've registered a course or two. Try using 'a' to add a course.")
-			continue
+		catalog.add_course(course)
+		changes += 1
+		notices.append(("Added %s: %s. Please ensure the following details are correct." % (course.code, course.title), course))
+
+	def notify(message):
+		# for the seat watcher's thread. a section that can't be checked would otherwise be
+		# mentioned once for every poll
+		if (message, None) not in notices:
+			notices.append((message, None))
+
+	def toggle_watch(course):
+		# starts or stops watching every section of course for open seats. returns what happened
+		nonlocal watching
+		if course in watched:
+			term = watched.pop(course)
+			for section in course.all_sections():
+				watcher.unwatch(section, term)
+			message = "Stopped watching %s for open seats." % course.code
+		else:
+			term = term_from_url(course.url)
+			watcher.watch_course(course, term)
+			watched[course] = term
+			message = "Watching %s for open seats, checking every %d seconds." % (course.code, args.interval)
+		if not watched and watching is not None:
+			watching.cancel()
+			watching = None
+		elif watched and (watching is None or not watching.running()):
+			stop = threading.Event()
+			watching = BackgroundJob("", run_in_thread(
+				watcher.run,
+				args.interval,
+				lambda change: loop.call_soon_threadsafe(notify, "Seats changed: %s" % change),
+				lambda section, error: loop.call_soon_threadsafe(notify, "Couldn't check the seats for %d: %s" % (section.crn, error)),
+				stop
+			), stop=stop)
+			jobs.append(watching)
+		if watching is not None:
+			watching.description = "Watching %s for open seats" % ", ".join(course.code for course in watched)
+		return message
+
+	def search_and_keep(*arguments):
+		# runs on the background pool. the index goes in indexes even if nobody ever looks at it
+		index = search_in_background(*arguments)
+		if index is not None:
+			indexes.append(index)
+		return index
+
+	print("\n" * 200)
+
+
+	while True:
+		print("schedule_scraper.py  Copyright (C) 2021  Matt Lebl")
+		print("This program comes with ABSOLUTELY NO WARRANTY; for details type `warranty'.")
+		print("This is free software, and you are welcome to redistribute it")
+		print("under certain conditions; type `copyright' for details.")
+		print()
+		print()
+		for message, course in notices:
+			print(message)
+			if course is not None:
+				print_sections(course)
+			print()
+		del notices[:]
+		for job in jobs:
+			if job.running():
+				print("Still going: %s" % job.status())
+		if search is not None and not search.running() and not search.future.cancelled():
+			print("The search for schedules has finished. Choose 'f' to look through them.")
+			print()
+		print("Please choose an action.")
+		print("a - add a course, m - manage courses, f - find schedules, i - instructors & rooms,")
+		print("j - background jobs, e - exit")
+		try:
+			action = await ask("> ")
+			print("\n" * 200)
+		except EOFError:
+			print("Goodbye")
+			exit()
+		print()
 
-		selected = 0
-		while True:
-			print("Here are all the courses you've added. Enter a number to select a")
-			print("different one, (I have selected the first one for you already), and")
-			print("then choose which action you would like to take.")
+		if action.lower().strip() == 'warranty':
+			print("There is no warranty for the program, to the extent permitted by applicable law. Except when")
+			print("otherwise stated in writing the copyright holders and/or other parties provide the program")
+			print("\"as is\" without warranty of any kind, either expressed or implied, including, but not limited")
+			print("to, the implied warranties of merchantability and fitness for a particular purpose. The entire")
+			print("risk as to the quality and performance of the program is with you. Should the program prove")
+			print("defective, you assume the cost of all necessary servicing, repair or correction.")
 			print()
-			for i in range(len(courses)):
-				print("(%d) " % i, end='')
-				if i == selected:
-					print("-->", end='')
-				else:
-					print("   ", end='')
-				print(" %s: %s (%s)" % (courses[i].code, courses[i].title, "active" if courses[i].active else "inactive"))
+			print("(In essence, this means please double check any schedules you generate before you try to register them!)")
 			print()
-			print("d - delete, a - activate/deactivate, s - list/edit (s)ections, e - exit/back, # - change selected course")
-			try:
-				action = input("> ")
-				print("\n" * 200)
-			except EOFError:
-				print("Goodbye")
-				exit()
+		
+		elif action.lower().strip() == 'copyright':
+			print("This program is free software---you are welcome to distribute it and modify it subject to")
+			print("the terms of the Affero GPL available here: https://www.gnu.org/licenses/agpl-3.0.html")
+			print()
+		elif action.lower().strip() == 'a':
+			url = await ask("Paste schedule link: ")
+			print()
+			job = BackgroundJob("Fetching %s" % url, run_in_thread(parse_course_from_url, url))
+			job.future.add_done_callback(lambda future, url=url: course_fetched(future, url))
+			jobs.append(job)
+			# most fetches are quick, and then there's no need to mention it at all
+			await asyncio.wait([job.future], timeout=1)
+			if job.running():
+				print("That course is taking a while, so I'll keep fetching it in the background. You can")
+				print("carry on in the meantime, and check on it (or cancel it) with 'j'.")
+				print()
+		elif action.lower().strip() == 'm':
+			if len(courses) == 0:
+				print("You do not yet have any courses registered! I'll be happy to help you manage")
+				print("them after you've registered a course or two. Try using 'a' to add a course.")
+				continue
+			if search is not None and search.running():
+				print("Your courses can't be changed while a search is running, since it's working from them.")
+				print("Let it finish (or cancel it from 'f' or 'j') and then come back.")
+				continue
 
-			if action.lower().strip() == 'd':
-				del courses[selected]
-				print("Deleted.")
+			selected = 0
+			while True:
+				print("Here are all the courses you've added. Enter a number to select a")
+				print("different one, (I have selected the first one for you already), and")
+				print("then choose which action you would like to take.")
 				print()
-				if len(courses) == 0:
-					print("Since this was the last remaining course, I'm returning you to the main menu.")
-					break
-				else:
-					selected = 0
-			elif action.lower().strip() == 'a':
-				courses[selected].active = not courses[selected].active
-			elif action.lower().strip() == 's':
-				selected_section = 0
-				while True:
-					print("Viewing %s: %s" % (courses[selected].code, courses[selected].title))
-					print("Here is a listing of the sections for this course. You can exclude those sections that aren't")
-					print("useful to you (perhaps due to an outside obligation or degree restriction) and they will not")
-					print("be considered for schedule planning. Additionally, you can \"lock\" sections, so that")
-					print("the scheduler will only show schedule options with that particular section. You can only lock")
-					print("one section at a time from each of the lecture, lab, or tutorial components.")
-					num_lecture_sections = len(courses[selected].lecture_sections)
-					num_lab_sections = len(courses[selected].lab_sections)
-					num_tutorial_sections = len(courses[selected].tutorial_sections)
-
-					if num_lecture_sections == 0 and num_lab_sections == 0 and num_tutorial_sections == 0:
-						print("There aren't any sections left in this course! That's one way of deleting the course,")
-						print("I suppose. :P I'm going ahead and removing this course for you and returning you to the")
-						print("course menu. If you need to add the course again, you can do it from the main menu.")
-						del courses[selected]
-						selected = 0
-						break
-					print("Lecture sections:")
-					for i in range(num_lecture_sections):
-						print("  (%d) " % i, end='')
-						if i == selected_section:
-							print("-->", end='')
-						else:
-							print("   ", end='')
-						print(" %s" % str(courses[selected].lecture_sections[i]), end='')
-						if courses[selected].lecture_sections[i].lock:
-							print(" (locked)")
-						elif courses[selected].lecture_sections[i].exclude:
-							print(" (excluded)")
-						else:
-							print()
-					print("Lab sections:")
-					for i in range(num_lab_sections):
-						print("  (%d) " % (i + num_lecture_sections), end='')
-						if i == selected_section - num_lecture_sections:
-							print("-->", end='')
-						else:
-							print("   ", end='')
-						print(" %s" % str(courses[selected].lab_sections[i]), end='')
-						if courses[selected].lab_sections[i].lock:
-							print(" (locked)")
-						elif courses[selected].lab_sections[i].exclude:
-							print(" (excluded)")
-						else:
-							print()
-					print("Tutorial sections:")
-					for i in range(num_tutorial_sections):
-						print("  (%d) " % (i + num_lecture_sections + num_lab_sections), end='')
-						if i == selected_section - num_lecture_sections - num_lab_sections:
-							print("-->", end='')
-						else:
-							print("   ", end='')
-						print(" %s" % str(courses[selected].tutorial_sections[i]), end = '')
-						if courses[selected].tutorial_sections[i].lock:
-							print(" (locked)")
-						elif courses[selected].tutorial_sections[i].exclude:
-							print(" (excluded)")
-						else:
-							print()
+				for i in range(len(courses)):
+					print("(%d) " % i, end='')
+					if i == selected:
+						print("-->", end='')
+					else:
+						print("   ", end='')
+					print(" %s: %s (%s)" % (courses[i].code, courses[i].title, "active" if courses[i].active else "inactive"), end='')
+					print(" (watching seats)" if courses[i] in watched else "")
+				print()
+				print("d - delete, a - activate/deactivate, s - list/edit (s)ections, w - watch for open seats,")
+				print("e - exit/back, # - change selected course")
+				try:
+					action = await ask("> ")
+					print("\n" * 200)
+				except EOFError:
+					print("Goodbye")
+					exit()
 
+				if action.lower().strip() == 'd':
+					if courses[selected] in watched:
+						toggle_watch(courses[selected])
+					del courses[selected]
+					catalog = CatalogIndex(courses)
+					changes += 1
+					print("Deleted.")
 					print()
-					print("x - exclude, l - lock, e - exit/back, # - change selected section")
-					try:
-						action = input("> ")
-						print("\n" * 200)
-					except EOFError:
-						print("Goodbye")
-						exit()
-
-					if action.lower().strip() == 'x':
-						if selected_section < num_lecture_sections:
-							courses[selected].lecture_sections[selected_section].toggle_exclude()
-						elif selected_section < num_lecture_sections + num_lab_sections:
-							courses[selected].lab_sections[selected_section - num_lecture_sections].toggle_exclude()
-						elif selected_section < num_lecture_sections + num_lab_sections + num_tutorial_sections:
-							courses[selected].tutorial_sections[selected_section - num_lecture_sections - num_lab_sections].toggle_exclude()
-					elif action.lower().strip() == 'l':
-						if selected_section < num_lecture_sections:
-							courses[selected].toggle_lock_lecture(selected_section)
-						elif selected_section < num_lecture_sections + num_lab_sections:
-							courses[selected].toggle_lock_lab(selected_section - num_lecture_sections)
-						elif selected_section < num_lecture_sections + num_lab_sections + num_tutorial_sections:
-							courses[selected].toggle_lock_tutorial(selected_section - num_lecture_sections - num_lab_sections)
-					elif action.lower().strip() == 'e':
+					if len(courses) == 0:
+						print("Since this was the last remaining course, I'm returning you to the main menu.")
 						break
 					else:
+						selected = 0
+				elif action.lower().strip() == 'a':
+					courses[selected].active = not courses[selected].active
+					changes += 1
+				elif action.lower().strip() == 'w':
+					try:
+						print(toggle_watch(courses[selected]))
+					except ValueError:
+						print("Sorry, I can't tell which term %s is in from its link, so I can't look up its seats." % courses[selected].code)
+					print()
+				elif action.lower().strip() == 's':
+					selected_section = 0
+					while True:
+						print("Viewing %s: %s" % (courses[selected].code, courses[selected].title))
+						print("Here is a listing of the sections for this course. You can exclude those sections that aren't")
+						print("useful to you (perhaps due to an outside obligation or degree restriction) and they will not")
+						print("be considered for schedule planning. Additionally, you can \"lock\" sections, so that")
+						print("the scheduler will only show schedule options with that particular section. You can only lock")
+						print("one section at a time from each component (lecture, lab, tutorial and so on).")
+						sections = courses[selected].all_sections()
+
+						if len(sections) == 0:
+							print("There aren't any sections left in this course! That's one way of deleting the course,")
+							print("I suppose. :P I'm going ahead and removing this course for you and returning you to the")
+							print("course menu. If you need to add the course again, you can do it from the main menu.")
+							if courses[selected] in watched:
+								toggle_watch(courses[selected])
+							del courses[selected]
+							catalog = CatalogIndex(courses)
+							changes += 1
+							selected = 0
+							break
+						number = 0
+						for component, component_sections in courses[selected].components.items():
+							print("%s sections:" % component_name(component))
+							for section in component_sections:
+								print("  (%d) " % number, end='')
+								if number == selected_section:
+									print("-->", end='')
+								else:
+									print("   ", end='')
+								print(" %s" % str(section), end='')
+								if section.seats is not None:
+									print(" [%d of %d seats left]" % (section.seats[2], section.seats[0]), end='')
+								if section.lock:
+									print(" (locked)")
+								elif section.exclude:
+									print(" (excluded)")
+								else:
+									print()
+								number += 1
+
+						print()
+						print("x - exclude, l - lock, e - exit/back, # - change selected section")
 						try:
-							num = int(action)
-						except:
-							print("Sorry, I didn't understand that.")
-							continue
+							action = await ask("> ")
+							print("\n" * 200)
+						except EOFError:
+							print("Goodbye")
+							exit()
+
+						if action.lower().strip() == 'x':
+							sections[selected_section].toggle_exclude()
+							changes += 1
+						elif action.lower().strip() == 'l':
+							toggle_lock_section(courses[selected], selected_section)
+							changes += 1
+						elif action.lower().strip() == 'e':
+							break
+						else:
+							try:
+								num = int(action)
+							except:
+								print("Sorry, I didn't understand that.")
+								continue
 
-						if num >= num_lecture_sections + num_lab_sections + num_tutorial_sections or num < 0:
-							print("Sorry, this has to be one of the presented options.")
-							continue
+							if num >= len(sections) or num < 0:
+								print("Sorry, this has to be one of the presented options.")
+								continue
 
-						selected_section = num
+							selected_section = num
 
-				if len(courses) == 0:
-					print("Wait, there are no more courses? In this case, I'm returning you to the main menu.")
-					break
+					if len(courses) == 0:
+						print("Wait, there are no more courses? In this case, I'm returning you to the main menu.")
+						break
 
 					
-			elif action.lower().strip() == 'e':
-				break
-			else:
+				elif action.lower().strip() == 'e':
+					break
+				else:
+					try:
+						num = int(action)
+					except:
+						print("Sorry, I didn't understand that.")
+						print("\n" * 200)
+						continue
+
+					if num >= len(courses) or num < 0:
+						print("Sorry, this has to be one of the presented options.")
+						print("\n" * 200)
+						continue
+
+					selected = num
+				
+		elif action.lower().strip() == 'e':
+			print("Goodbye")
+			exit()
+		elif action.lower().strip() == 'i':
+			if len(courses) == 0:
+				print("You have not added any courses yet! Once you have, I can show you who teaches them and where.")
+				continue
+
+			while True:
+				print("Across your courses there are %d instructors, %d buildings and %d rooms." % tuple(len(catalog.names[kind]) for kind in catalog.kinds))
+				conflicts = catalog.room_conflicts()
+				if conflicts:
+					print("These sections are booked into the same room at the same time:")
+					for room, day, first, second in conflicts:
+						print("  %s on %s: %s %s and %s %s" % (room, day, first.course_code, first.section_code, second.course_code, second.section_code))
+				print()
+				print("Enter part of an instructor's name, a building or a room to see its sections, or e to go back.")
+				try:
+					action = await ask("> ")
+					print("\n" * 200)
+				except EOFError:
+					print("Goodbye")
+					exit()
+
+				if action.lower().strip() == 'e':
+					break
+				found = False
+				for kind in catalog.kinds:
+					for name in catalog.find(kind, action.strip()):
+						found = True
+						print("%s %s:" % (kind.capitalize(), name))
+						for day, start, end, section, meeting in catalog.meetings_for(kind, name):
+							print("  %s %02d:%02d-%02d:%02d  %s %s [%d] in %s with %s" % (day, start // 60, start % 60, end // 60, end % 60, section.course_code, section.section_code, section.crn, meeting.location, meeting.instructor))
+						print()
+				if not found:
+					print("Sorry, nobody and nowhere matched that.")
+					print()
+		elif action.lower().strip() == 'j':
+			while True:
+				if len(jobs) == 0:
+					print("Nothing is running in the background right now.")
+					break
+				for number, job in enumerate(jobs):
+					print("(%d) %s" % (number, job.status()))
+				print()
+				print("Enter a job's number to cancel it, e to go back, or just press enter to check again.")
+				try:
+					action = await ask("> ")
+					print("\n" * 200)
+				except EOFError:
+					print("Goodbye")
+					exit()
+
+				if action.lower().strip() == 'e':
+					break
+				elif action.strip() == '':
+					continue
 				try:
 					num = int(action)
 				except:
 					print("Sorry, I didn't understand that.")
-					print("\n" * 200)
 					continue
-
-				if num >= len(courses) or num < 0:
+				if num >= len(jobs) or num < 0:
 					print("Sorry, this has to be one of the presented options.")
-					print("\n" * 200)
 					continue
+				if jobs[num].running():
+					jobs[num].cancel()
+					print("Cancelled.")
+				else:
+					print("That one has already finished.")
+			# once they've been seen here, finished jobs can go
+			jobs[:] = [job for job in jobs if job.running()]
+		elif action.lower().strip() == 'f':
+			if search is not None and search_changes != changes:
+				print("Your courses have changed since the last search started, so I'm starting it again.")
+				print()
+				search.cancel()
+				search = None
+			if search is None:
+				if len(courses) < 1:
+					print("You have not added any courses yet! I'll be happy to work out some schedules for you after")
+					print("you add some courses using 'a'.")
+					continue
+				if schedules is not None:
+					schedules.close()
+					indexes.remove(schedules)
+					schedules = None
+				memory_budget = None
+				if args.memory_budget is not None:
+					memory_budget = int(args.memory_budget * 1024 * 1024)
+				constraint = None
+				if args.travel_time is not None:
+					constraint = catalog.travel_constraint(args.travel_time)
+				progress = SearchProgress()
+				future = loop.run_in_executor(background, search_and_keep, list(courses), constraint, args.index_file, memory_budget, progress)
+				search_changes = changes
+				search = BackgroundJob("Searching for schedules", future, progress)
+				jobs.append(search)
+				# a small search is done before anyone would notice
+				await asyncio.wait([future], timeout=1)
+
+			while search.running():
+				print(search.status())
+				print("The search is still going. You can look through what it's found so far while you wait.")
+				print("g - preview the schedules found so far, c - cancel the search, e - exit/back (the search")
+				print("keeps going), or just press enter to check on it again")
+				try:
+					action = await ask("> ")
+					print("\n" * 200)
+				except EOFError:
+					print("Goodbye")
+					exit()
 
-				selected = num
-				
-	elif action.lower().strip() == 'e':
-		print("Goodbye")
-		exit()
-	elif action.lower().strip() == 'f':
-		if len(courses) < 1:
-			print("You have not added any courses yet! I'll be happy to work out some schedules for you after")
-			print("you add some courses using 'a'.")
-			continue
-		schedules = find_schedules(courses)
-		print("I found %d possible schedules." % len(schedules))
-		if len(schedules) == 0:
-			print("Sorry about that! If you have sections locked, try unlocking them. Also, you can try")
-			print("deactivating some courses to see what schedules you could get if those courses were")
-			print("not included.")
-			continue
-		latest_start_time = datetime.time(hour=0, minute=0)
-		earliest_finish_time = datetime.time(hour=23, minute=59)
-		num_with_dayoff = 0
-		for schedule in schedules:
-			if schedule.find_earliest_start() > latest_start_time:
-				latest_start_time = schedule.find_earliest_start()
-			if schedule.find_latest_end() < earliest_finish_time:
-				earliest_finish_time = schedule.find_latest_end()
-			if schedule.count_days_off() > 0:
-				num_with_dayoff += 1
-		print("Latest possible start time: %s" % latest_start_time.strftime(r"%I:%M %p"))
-		print("Earliest possible finish time: %s" % earliest_finish_time.strftime(r"%I:%M %p"))
-		print("Number of schedules with at least one day off: %d" % num_with_dayoff)
-		print()
+				if action.lower().strip() == 'g':
+					if search.progress.lengths is None or len(search.progress) == 0:
+						print("Nothing yet! Give it a moment.")
+						continue
+					await view_schedules(search.progress, catalog, search)
+				elif action.lower().strip() == 'c':
+					search.cancel()
+				elif action.lower().strip() == 'e':
+					break
 
-		while True:
-			print("How would you like to sort the possible schedules?")
-			print("You can sort by multiple criteria by sorting in order from least important")
-			print("to most. For instance, if I kinda want to end my day earlier but I mostly")
-			print("want to start my day later, then I'd first sort by earliest finishing time")
-			print("and then by latest start time.")
+			if search.running():
+				continue
+			finished, search = search, None
+			if finished.future.cancelled():
+				print("Okay, I've cancelled the search.")
+				continue
+			try:
+				schedules = finished.future.result()
+			except Exception as e:
+				print("Sorry, something went wrong while searching: %s" % e)
+				continue
+			print("I found %d possible schedules." % len(schedules))
+			if len(schedules) == 0:
+				print("Sorry about that! If you have sections locked, try unlocking them. Also, you can try")
+				print("deactivating some courses to see what schedules you could get if those courses were")
+				print("not included.")
+				continue
+			print_schedule_summary(schedules)
 			print()
-			print("When you are ready to read through the schedules, use the \"go\" option.")
-			print("l - latest start times first")
-			print("f - earliest finishing times first")
-			print("d - days off first")
-			print("g - go, view the schedules")
-			print("e - exit/back")
 
-			try:
-				action = input("> ")
-				print("\n" * 200)
-			except EOFError:
-				print("Goodbye")
-				exit()
-
-			if action.lower().strip() == 'l':
-				schedules = sorted(schedules, key=earliest_start, reverse=True)
-				print("Sorted the schedules by latest start time.")
-			elif action.lower().strip() == 'f':
-				schedules = sorted(schedules, key=latest_end)
-				print("Sorted the schedules by earliest finish time.")
-			elif action.lower().strip() == 'd':
-				schedules = sorted(schedules, key=days_off, reverse=True)
-				print("Sorted the schedules by days off.")
-			elif action.lower().strip() == 'e':
-				break
-			elif action.lower().strip() == 'g':
-				selected = 0
-				while True:
-					schedules[selected].print_calendar()
-					for course_schedule in schedules[selected].course_schedules:
-						print(course_schedule.section_and_crn())
-					print("Viewing schedule (%d of %d)" % (selected + 1, len(schedules)))
-					print("n - next, b - back, e - exit")
-					try:
-						action = input("> ")
-						print("\n" * 200)
-					except EOFError:
-						print("Goodbye")
-						exit()
-
-					if action.lower().strip() == 'n':
-						selected = (selected + 1) % len(schedules)
-					elif action.lower().strip() == 'b':
-						selected = (selected - 1) % len(schedules)
-					elif action.lower().strip() == 'e':
-						break
+			while True:
+				print("How would you like to sort the possible schedules?")
+				print("You can sort by multiple criteria by sorting in order from least important")
+				print("to most. For instance, if I kinda want to end my day earlier but I mostly")
+				print("want to start my day later, then I'd first sort by earliest finishing time")
+				print("and then by latest start time.")
+				print()
+				print("When you are ready to read through the schedules, use the \"go\" option.")
+				print("l - latest start times first")
+				print("f - earliest finishing times first")
+				print("d - days off first")
+				print("w - weighted ranking, considering several things at once")
+				print("g - go, view the schedules")
+				print("e - exit/back")
 
-	else:
-		print("Sorry, I don't know what that means.")
+				try:
+					action = await ask("> ")
+					print("\n" * 200)
+				except EOFError:
+					print("Goodbye")
+					exit()
 
+				if action.lower().strip() == 'l':
+					schedules.sort("start", reverse=True)
+					print("Sorted the schedules by latest start time.")
+				elif action.lower().strip() == 'f':
+					schedules.sort("end")
+					print("Sorted the schedules by earliest finish time.")
+				elif action.lower().strip() == 'd':
+					schedules.sort("days_off", reverse=True)
+					print("Sorted the schedules by days off.")
+				elif action.lower().strip() == 'w':
+					preferences = await ask_weights()
+					print("\n" * 200)
+					if preferences is None:
+						print("Okay, I've left the schedules as they were.")
+						continue
+					schedules.rank(*preferences)
+					print("Ranked the schedules by your weights.")
+				elif action.lower().strip() == 'e':
+					break
+				elif action.lower().strip() == 'g':
+					await view_schedules(schedules, catalog)
 
+		else:
+			print("Sorry, I don't know what that means.")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Find schedules for your UVic courses.")
+	parser.add_argument("--serve", action="store_true", help="run a local HTTP/JSON scheduling service instead of the menu")
+	parser.add_argument("--host", default="127.0.0.1", help="address for --serve to listen on (default: 127.0.0.1)")
+	parser.add_argument("--port", type=int, default=8000, help="port for --serve to listen on (default: 8000)")
+	parser.add_argument("--workers", type=int, default=None, help="number of worker processes for searches")
+	parser.add_argument("--terms", nargs="+", metavar="TERM", help="plan several terms at once, e.g. --terms 202109 202201")
+	parser.add_argument("--plan", nargs="+", metavar="COURSE", help="course codes to plan in each term, e.g. --plan \"CSC 370\" SENG265")
+	parser.add_argument("--listing-url", default=LISTING_URL, help="listing url template used by --terms/--plan")
+	parser.add_argument("--show", type=int, default=1, help="number of schedules to print for each term (default: 1)")
+	parser.add_argument("--watch", nargs="+", metavar="ARG", help="watch sections for open seats: a term followed by CRNs, e.g. --watch 202109 12345 12346")
+	parser.add_argument("--seat-url", default=SEAT_URL, help="seat page url template used by --watch")
+	parser.add_argument("--interval", type=float, default=60.0, help="seconds between --watch polls (default: 60)")
+	parser.add_argument("--rate", type=float, default=2.0, help="most requests per second to send to one host (default: 2)")
+	parser.add_argument("--index-file", default=None, help="keep found schedules in this file instead of in memory")
+	parser.add_argument("--memory-budget", type=float, metavar="MB", help="keep found schedules within about this many megabytes of memory, using disk for the rest")
+	parser.add_argument("--travel-time", type=int, metavar="MINUTES", help="only find schedules that leave at least this long to get between buildings")
+	parser.add_argument("--self-test", type=int, metavar="CASES", help="check every search engine against a slow reference on random course loads")
+	parser.add_argument("--seed", type=int, default=None, help="random seed for --self-test")
+	args = parser.parse_args()
+
+	if args.self_test is not None:
+		passed = run_differential_tests(args.self_test, args.seed)
+		problem = check_seat_watcher()
+		if problem is not None:
+			print("Seat watcher: %s" % problem)
+			passed = False
+		else:
+			print("The seat watcher worked against a local fixture server.")
+		if not passed:
+			sys.exit(1)
+		return
+
+	if args.watch:
+		try:
+			term = args.watch[0]
+			crns = [int(crn) for crn in args.watch[1:]]
+		except ValueError:
+			parser.error("--watch takes a term followed by CRNs")
+		if not crns:
+			parser.error("--watch needs at least one CRN")
+		watcher = SeatWatcher(args.seat_url, args.rate)
+		for crn in crns:
+			watcher.watch(Section(crn, "", "", []), term)
+		print("Watching %d sections, checking every %d seconds (ctrl-c to stop)." % (len(crns), args.interval))
+		stamp = lambda: datetime.datetime.now().strftime(r"%I:%M:%S %p")
+		try:
+			watcher.run(
+				args.interval,
+				lambda change: print("[%s] %s" % (stamp(), change)),
+				lambda section, error: print("[%s] couldn't check %d: %s" % (stamp(), section.crn, error))
+			)
+		except KeyboardInterrupt:
+			print("Goodbye")
+		return
+
+	if args.terms or args.plan:
+		if not (args.terms and args.plan):
+			parser.error("--terms and --plan go together")
+		try:
+			template = [" ".join(parse_course_spec(spec)) for spec in args.plan]
+		except ValueError as e:
+			parser.error(str(e))
+		print_term_plans(plan_terms(args.terms, template, CourseLoader(args.listing_url), args.workers), args.show)
+		return
+
+	if args.serve:
+		service = ScheduleService(args.workers)
+		try:
+			asyncio.run(service.serve(args.host, args.port))
+		except KeyboardInterrupt:
+			print("Goodbye")
+		finally:
+			service.pool.shutdown()
+		return
+
+	background = concurrent.futures.ThreadPoolExecutor()
+	jobs = []
+	indexes = []
+	interrupted = False
+	try:
+		asyncio.run(run_menu(args, background, jobs, indexes))
+	except KeyboardInterrupt:
+		print()
+		print("Goodbye")
+		interrupted = True
+	finally:
+		# a second ctrl-c mustn't cut the clean up short and leave scratch files behind
+		signal.signal(signal.SIGINT, signal.SIG_IGN)
+		# don't leave a search running after we've gone. (the loop is closed by now, so this can't go
+		# through job.cancel.) a cancelled search stops quickly, cleaning up after itself as it goes
+		for job in jobs:
+			if job.progress is not None:
+				job.progress.cancelled.set()
+		background.shutdown()
+		# and once the searches have stopped, nothing else can add to indexes. closing them removes
+		# any scratch files a big search spilled to disk
+		for index in indexes:
+			index.close()
+	if interrupted:
+		# ctrl-c leaves an input() waiting on its daemon thread, and the interpreter can't shut down
+		# cleanly around that, so leave straight away. os._exit skips any other clean up, which is
+		# why everything above (searches and their scratch files) has to be done with by here
+		sys.stdout.flush()
+		os._exit(130)
+
+
+if __name__ == '__main__':
+	main()